@@ -0,0 +1,31 @@
+// Client side of broadcast.BroadcastStatus. Listens for the "role" messages the broadcast
+// server sends next to the shared frames, and turns the page into a read-only viewer unless
+// this session is the controller.
+const BroadcastModule = function () {
+  const banner = document.createElement("p");
+  document.getElementById("elements-topbar").appendChild(banner);
+  const controls = ["play-pause", "step", "reset"].map((id) => document.getElementById(id));
+
+  const show = (role) => {
+    banner.innerText = role.controller
+      ? `Controlling the shared run (${role.viewers} connected)`
+      : `Watching read-only (${role.viewers} connected)`;
+    controls.forEach((control) => { control.style.display = role.controller ? "" : "none"; });
+    document.querySelectorAll("#sidebar input, #sidebar select").forEach((input) => {
+      input.disabled = !role.controller;
+    });
+  };
+
+  const handle = ws.onmessage;
+  ws.onmessage = (message) => {
+    const msg = JSON.parse(message.data);
+    if (msg.type === "role") show(msg);
+    else handle(message);
+  };
+
+  this.render = (data) => {
+    stepDisplay.innerText = data.step;
+  };
+
+  this.reset = () => {};
+};
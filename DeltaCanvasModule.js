@@ -0,0 +1,70 @@
+// Client side of canvas.DeltaCanvasGrid. Keeps the last portrayal of every agent, applies
+// the changed and removed entries of each frame and redraws only the layers they touched.
+// Every layer has its own stacked canvas, so unchanged layers are never cleared or redrawn.
+const DeltaCanvasModule = function (canvas_width, canvas_height, grid_width, grid_height) {
+  const createCanvas = () => {
+    const canvas = document.createElement("canvas");
+    Object.assign(canvas, { width: canvas_width, height: canvas_height, className: "world-grid" });
+    return canvas;
+  };
+
+  const parent = document.createElement("div");
+  Object.assign(parent, { style: `height:${canvas_height}px;`, className: "world-grid-parent" });
+  document.getElementById("elements").appendChild(parent);
+
+  // grid lines sit on top of every layer, like in mesa's CanvasModule
+  const lines = createCanvas();
+  parent.appendChild(lines);
+  new GridVisualization(canvas_width, canvas_height, grid_width, grid_height,
+                        lines.getContext("2d"), null).drawGridLines();
+
+  const entries = new Map();
+  const layers = new Map();
+
+  const layer = (index) => {
+    if (!layers.has(index)) {
+      const canvas = createCanvas();
+      // keep the canvases stacked in layer order, below the grid lines
+      const above = [...layers.keys()].filter((other) => other > index).sort((a, b) => a - b);
+      parent.insertBefore(canvas, above.length ? layers.get(above[0]).canvas : lines);
+      const draw = new GridVisualization(canvas_width, canvas_height, grid_width, grid_height,
+                                         canvas.getContext("2d"), null);
+      layers.set(index, { canvas, draw });
+    }
+    return layers.get(index);
+  };
+
+  const redraw = (index) => {
+    // drawLayer flips y and rewrites colors in place, so it gets copies of the cached entries
+    const portrayals = [];
+    for (const portrayal of entries.values()) {
+      if (portrayal.Layer === index) portrayals.push({ ...portrayal });
+    }
+    const { draw } = layer(index);
+    draw.resetCanvas();
+    draw.drawLayer(portrayals);
+  };
+
+  this.render = (data) => {
+    const dirty = new Set();
+    if (data.full) {
+      for (const index of layers.keys()) dirty.add(index);
+      entries.clear();
+    }
+    for (const key of data.removed) {
+      if (entries.has(key)) dirty.add(entries.get(key).Layer);
+      entries.delete(key);
+    }
+    for (const [key, portrayal] of Object.entries(data.changed)) {
+      if (entries.has(key)) dirty.add(entries.get(key).Layer);
+      dirty.add(portrayal.Layer);
+      entries.set(key, portrayal);
+    }
+    dirty.forEach(redraw);
+  };
+
+  this.reset = () => {
+    entries.clear();
+    for (const { draw } of layers.values()) draw.resetCanvas();
+  };
+};
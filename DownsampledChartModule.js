@@ -0,0 +1,87 @@
+// Client side of charts.DownsampledChart. Each frame replaces the plotted overview of the
+// whole run. Scrolling over the chart zooms into the range under the cursor and fetches it at
+// full detail from /chart/<index>; while zoomed, new frames are kept but not drawn until a
+// double click goes back to the live overview.
+const DownsampledChartModule = function (series, canvas_width, canvas_height) {
+  // the element's position in the page, which is what the server's /chart/<index> expects
+  const index = elements.length;
+  const canvas = document.createElement("canvas");
+  Object.assign(canvas, { width: canvas_width, height: canvas_height, style: "border:1px dotted" });
+  document.getElementById("elements").appendChild(canvas);
+
+  const fill = (hex) => {
+    if (hex.indexOf("#") != 0) return "rgba(0,0,0,0.1)";
+    const [r, g, b] = [1, 3, 5].map((i) => parseInt(hex.substring(i, i + 2), 16));
+    return `rgba(${r},${g},${b},0.1)`;
+  };
+
+  const chart = new Chart(canvas.getContext("2d"), {
+    type: "line",
+    data: {
+      datasets: series.map((s) => ({ label: s.Label, borderColor: s.Color, backgroundColor: fill(s.Color), data: [] })),
+    },
+    options: {
+      responsive: true,
+      animation: false,
+      parsing: false,
+      elements: { point: { radius: 0 } },
+      scales: { x: { type: "linear", display: true, ticks: { maxTicksLimit: 11 } }, y: { display: true } },
+    },
+  });
+
+  let latest = null;
+  let zoomed = null;
+
+  const show = (data) => {
+    data.series.forEach(([xs, ys], i) => {
+      chart.data.datasets[i].data = xs.map((x, j) => ({ x: x, y: ys[j] }));
+    });
+    chart.options.scales.x.min = data.start;
+    chart.options.scales.x.max = Math.max(data.end - 1, data.start + 1);
+    chart.update();
+  };
+
+  const zoom = (start, end) => {
+    zoomed = { start, end };
+    fetch(`/chart/${index}?start=${start}&end=${end}&points=${canvas_width}`)
+      .then((response) => response.json())
+      .then((data) => {
+        if (zoomed && zoomed.start === start && zoomed.end === end) show(data);
+      });
+  };
+
+  canvas.addEventListener("wheel", (event) => {
+    if (!latest || latest.rows < 2) return;
+    event.preventDefault();
+    const { start, end } = zoomed || { start: 0, end: latest.rows };
+    const at = chart.scales.x.getValueForPixel(event.offsetX);
+    const factor = event.deltaY < 0 ? 0.5 : 2;
+    let from = Math.floor(at - (at - start) * factor);
+    let to = Math.ceil(at + (end - at) * factor);
+    from = Math.max(0, from);
+    to = Math.min(latest.rows, Math.max(to, from + 2));
+    if (from === 0 && to === latest.rows) {
+      zoomed = null;
+      show(latest);
+    } else {
+      zoom(from, to);
+    }
+  });
+
+  canvas.addEventListener("dblclick", () => {
+    zoomed = null;
+    if (latest) show(latest);
+  });
+
+  this.render = (data) => {
+    latest = data;
+    if (!zoomed) show(data);
+  };
+
+  this.reset = () => {
+    latest = null;
+    zoomed = null;
+    chart.data.datasets.forEach((dataset) => { dataset.data = []; });
+    chart.update();
+  };
+};
@@ -0,0 +1,116 @@
+// Client side of raster.RasterHeatmap. Blends the chosen layer images on one canvas, zooms
+// with the mouse wheel, pans by dragging and resets the view on double click. Drones, beacons
+// and stations are drawn on top once a cell is at least AGENT_ZOOM pixels wide.
+const HeatmapModule = function (canvas_width, canvas_height, layer_names) {
+  const AGENT_ZOOM = 4;
+  // state colors in snapshot.SCOUT_STATES / snapshot.MINER_STATES order
+  const SCOUT_COLORS = ["#4363d8", "#800080", "#3cb44b", "#e6194B", "#f58231"];
+  const MINER_COLORS = ["#4363d8", "#800080", "#e6194B", "#3cb44b", "#42d4f4", "#f58231"];
+
+  const parent = document.createElement("div");
+  const controls = document.createElement("div");
+  const canvas = document.createElement("canvas");
+  Object.assign(canvas, { width: canvas_width, height: canvas_height });
+  canvas.style.border = "1px dotted";
+  parent.appendChild(controls);
+  parent.appendChild(canvas);
+  document.getElementById("elements").appendChild(parent);
+  const context = canvas.getContext("2d");
+
+  const images = {};
+  const shown = {};
+  for (const name of layer_names) {
+    images[name] = new Image();
+    images[name].onload = () => draw();
+    shown[name] = name !== "coverage";
+    const label = document.createElement("label");
+    const box = document.createElement("input");
+    Object.assign(box, { type: "checkbox", checked: shown[name] });
+    box.onchange = () => { shown[name] = box.checked; draw(); };
+    label.appendChild(box);
+    label.appendChild(document.createTextNode(` ${name} `));
+    controls.appendChild(label);
+  }
+
+  let frame = null;
+  // view: cells per canvas pixel is 1 / scale, (left, top) is the cell at the canvas corner,
+  // counted from the top of the map so that y points up like on the grid canvas
+  let zoom = 1, left = 0, top = 0;
+  const scale = () => zoom * Math.min(canvas_width / frame.width, canvas_height / frame.height);
+
+  const draw = () => {
+    context.fillStyle = "#000";
+    context.fillRect(0, 0, canvas_width, canvas_height);
+    if (!frame) return;
+    const s = scale();
+    context.imageSmoothingEnabled = false;
+    context.globalCompositeOperation = "lighter";
+    for (const name of layer_names) {
+      const image = images[name];
+      if (!shown[name] || !image.complete || !image.naturalWidth) continue;
+      const w = image.naturalWidth * frame.factor, h = image.naturalHeight * frame.factor;
+      context.drawImage(image, -left * s, (frame.height - h - top) * s, w * s, h * s);
+    }
+    context.globalCompositeOperation = "source-over";
+    if (s < AGENT_ZOOM) return;
+
+    const cell = (x, y) => [(x + 0.5 - left) * s, (frame.height - y - 0.5 - top) * s];
+    const square = (x, y, size, color) => {
+      const [cx, cy] = cell(x, y);
+      context.fillStyle = color;
+      context.fillRect(cx - size * s / 2, cy - size * s / 2, size * s, size * s);
+    };
+    const dot = (x, y, r, color) => {
+      const [cx, cy] = cell(x, y);
+      context.fillStyle = color;
+      context.beginPath();
+      context.arc(cx, cy, r * s, 0, Math.PI * 2);
+      context.fill();
+    };
+    for (const [x, y] of frame.stations) square(x, y, 1.7, "#e6beff");
+    for (const [x, y] of frame.beacons) dot(x, y, 0.15, "#FFFF00");
+    for (const [x, y, state] of frame.miners) square(x, y, 0.8, MINER_COLORS[state]);
+    for (const [x, y, state] of frame.scouts) dot(x, y, 0.35, SCOUT_COLORS[state]);
+  };
+
+  const resetView = () => { zoom = 1; left = 0; top = 0; };
+
+  canvas.addEventListener("wheel", (event) => {
+    if (!frame) return;
+    event.preventDefault();
+    // keep the cell under the cursor in place
+    const before = scale();
+    zoom = Math.min(Math.max(zoom * (event.deltaY < 0 ? 1.25 : 0.8), 1), 1000);
+    const after = scale();
+    left += event.offsetX / before - event.offsetX / after;
+    top += event.offsetY / before - event.offsetY / after;
+    draw();
+  });
+  let drag = null;
+  canvas.addEventListener("mousedown", (event) => { drag = [event.offsetX, event.offsetY]; });
+  canvas.addEventListener("mouseup", () => { drag = null; });
+  canvas.addEventListener("mouseleave", () => { drag = null; });
+  canvas.addEventListener("mousemove", (event) => {
+    if (!drag || !frame) return;
+    left -= (event.offsetX - drag[0]) / scale();
+    top -= (event.offsetY - drag[1]) / scale();
+    drag = [event.offsetX, event.offsetY];
+    draw();
+  });
+  canvas.addEventListener("dblclick", () => { resetView(); draw(); });
+
+  this.render = (data) => {
+    if (data.full) {
+      for (const name of layer_names) images[name].removeAttribute("src");
+    }
+    frame = data;
+    for (const [name, uri] of Object.entries(data.images)) images[name].src = uri;
+    draw();
+  };
+
+  this.reset = () => {
+    frame = null;
+    resetView();
+    draw();
+  };
+};
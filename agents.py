@@ -2,18 +2,49 @@ from mesa import Agent
 import numpy as np
 import random
 import math
-from collections import defaultdict
+import heapq
+from collections import defaultdict, deque
+
+class Drone(Agent):
+    # Every state change is counted in model.state_counts[type], a histogram of the fleet by
+    # state that the info panel and the data collector read without scanning the drones.
+    breakdown_step = None  # set by a fast-forward jump, which draws the next breakdown ahead
+
+    @property
+    def state(self):
+        return self._state
+
+    @state.setter
+    def state(self, state):
+        counts = self.model.state_counts[self.type]
+        previous = self.__dict__.get("_state")
+        if previous is not None:
+            counts[previous] -= 1
+        counts[state] += 1
+        self._state = state
+
+    def breaks_down(self):
+        if self.breakdown_step is None:
+            return self.rng.random() < self.malfunction_chance
+        # the drawn step passed while the drone was under repair, so it draws again from here
+        now = self.model.schedule.steps
+        if self.breakdown_step < now:
+            self.breakdown_step = now + self.model.steps_until(self.malfunction_chance)
+        return self.breakdown_step == now
+
+class ScoutDrone(Drone):
+    rng = random  # the shared generator; two-phase steps hand each drone its own
 
-class ScoutDrone(Agent):
     def __init__(self, unique_id, model, base_pos, max_energy=100, sensor_range=3):
         super().__init__(unique_id, model)
         self.type = "scout"
         self.energy = max_energy
         self.max_energy = max_energy
-        self.base_pos = base_pos
+        self.home_pos = base_pos  # home station, centre of the sector pattern
+        self.base_pos = base_pos  # station the scout returns to, the nearest one once it heads back
         self.state = "exploring"  # states: exploring, analyzing, returning, recharging, malfunctioning
         self.exploration_pattern = "sector"  # "spiral", "sector", or "quadrant"
-        self.analyzed_asteroids = set()
+        self.analyzed_asteroids = set()  # unique_ids, so the set stays valid when the scout changes process
         self.visited_positions = set()  
         self.sensor_range = sensor_range  
         self.target_position = None
@@ -38,13 +69,14 @@ class ScoutDrone(Agent):
 
     def step(self):
         self.step_count += 1
-        if self.state != "malfunctioning" and random.random() < self.malfunction_chance:
+        if self.state != "malfunctioning" and self.breaks_down():
             self.state = "malfunctioning"
-            self.repair_time = random.randint(3, 8)
+            self.repair_time = self.rng.randint(3, 8)
             self.model.events.append(f"Scout {self.unique_id} malfunctioned!")
             return
 
         if self.state == "malfunctioning":
+            self.base_pos = self.model.nearest_station_pos(self.pos)
             if self.pos == self.base_pos:
                 self.repair_time -= 1
                 if self.repair_time <= 0:
@@ -72,6 +104,7 @@ class ScoutDrone(Agent):
             self.analyze_asteroid()
 
         elif self.state == "returning":
+            self.base_pos = self.model.nearest_station_pos(self.pos)
             if self.pos == self.base_pos:
                 self.state = "recharging"
                 self.energy = min(self.energy + self.max_energy * 0.3, self.max_energy)  # Initial energy boost
@@ -82,9 +115,34 @@ class ScoutDrone(Agent):
             self.energy = min(self.energy + self.max_energy * 0.2, self.max_energy)
             if self.energy >= self.max_energy:
                 self.state = "exploring"
-                if random.random() < 0.3:
+                if self.rng.random() < 0.3:
                     self.reset_exploration_pattern()
 
+    def predict_quiet_steps(self, max_steps):
+        # per-step (energy, repair_time) while the scout sits at a station recharging or being
+        # repaired; stops before the first step that would touch the RNG, move or log an event
+        trajectory = []
+        energy, repair_time = self.energy, self.repair_time
+        for _ in range(max_steps):
+            if self.state == "malfunctioning":
+                if self.pos != self.model.nearest_station_pos(self.pos) or repair_time <= 1:
+                    break
+                repair_time -= 1
+            elif self.state == "recharging":
+                energy = min((energy - 1) + self.max_energy * 0.2, self.max_energy)
+                if energy >= self.max_energy:
+                    break
+            else:
+                break
+            trajectory.append((energy, repair_time))
+        return trajectory
+
+    def apply_quiet_step(self, values):
+        self.step_count += 1
+        self.energy, self.repair_time = values
+        if self.state == "malfunctioning":
+            self.base_pos = self.pos
+
     def scan_for_asteroids(self):
         neighbors = self.model.grid.get_neighbors(
             self.pos, moore=True, include_center=False, radius=self.sensor_range
@@ -93,7 +151,7 @@ class ScoutDrone(Agent):
         unanalyzed_asteroids = [
             neighbor for neighbor in neighbors
             if hasattr(neighbor, 'type') and neighbor.type == "asteroid"
-               and neighbor not in self.analyzed_asteroids
+               and neighbor.unique_id not in self.analyzed_asteroids
                and not (hasattr(neighbor, 'is_depleted') and neighbor.is_depleted)
         ]
 
@@ -111,7 +169,7 @@ class ScoutDrone(Agent):
             self.state = "exploring"
             return
 
-        self.analyzed_asteroids.add(self.target_asteroid)
+        self.analyzed_asteroids.add(self.target_asteroid.unique_id)
 
         if hasattr(self.target_asteroid, 'is_depleted') and self.target_asteroid.is_depleted:
             self.state = "exploring"
@@ -130,37 +188,24 @@ class ScoutDrone(Agent):
             existing_beacon = any(hasattr(a, 'type') and a.type == "beacon" for a in cell_contents)
 
             if not existing_beacon:
-                beacon = Beacon(
-                    self.model.next_id(),
-                    self.model,
-                    self.target_asteroid.pos,
-                    self.target_asteroid.resource_type,
-                    self.target_asteroid.resource_value,
-                    self.target_asteroid
-                )
-                self.model.grid.place_agent(beacon, self.target_asteroid.pos)
-                self.model.schedule.add(beacon)
-                self.model.active_beacons.append(beacon)
-                self.model.schedule.steps_stats["beacons_placed"] += 1
-
-                self.model.events.append(f"Scout {self.unique_id} placed beacon for {self.target_asteroid.resource_type}")
+                self.model.place_beacon(self, self.target_asteroid)
 
         self.state = "exploring"
 
     def reset_exploration_pattern(self):
         if self.exploration_pattern == "spiral":
             # reset spiral parameters
-            self.direction = random.randint(0, 3)
+            self.direction = self.rng.randint(0, 3)
             self.steps_in_direction = 1
             self.steps_taken = 0
             self.turns_taken = 0
         elif self.exploration_pattern == "sector":
             # move to a new sector
-            self.angle = random.uniform(0, 2 * math.pi)
+            self.angle = self.rng.uniform(0, 2 * math.pi)
             self.current_radius = 3
         elif self.exploration_pattern == "quadrant":
             # move to a different quadrant
-            self.quadrant = random.randint(0, 3)
+            self.quadrant = self.rng.randint(0, 3)
 
     def move_exploration_pattern(self):
         if self.exploration_pattern == "spiral":
@@ -200,7 +245,7 @@ class ScoutDrone(Agent):
                 self.turns_taken = 0
 
     def move_sector_pattern(self):
-        center_x, center_y = self.base_pos
+        center_x, center_y = self.home_pos
         target_x = center_x + int(self.current_radius * math.cos(self.angle))
         target_y = center_y + int(self.current_radius * math.sin(self.angle))
 
@@ -234,14 +279,30 @@ class ScoutDrone(Agent):
         else:  # Bottom-right
             bounds = (half_width, self.model.grid.width, 0, half_height)
 
+        if self.model.value_aware_exploration:
+            bounds = self.richest_subregion(bounds)
+
         # choose a random point in the quadrant
         if not self.target_position or self.pos == self.target_position:
-            x = random.randint(bounds[0], bounds[1] - 1)
-            y = random.randint(bounds[2], bounds[3] - 1)
+            x = self.rng.randint(bounds[0], bounds[1] - 1)
+            y = self.rng.randint(bounds[2], bounds[3] - 1)
             self.target_position = (x, y)
 
         self.move_safely_towards(self.target_position)
 
+    def richest_subregion(self, bounds):
+        # narrow the quadrant down to whichever quarter holds the most remaining market value
+        x0, x1, y0, y1 = bounds
+        mid_x, mid_y = (x0 + x1) // 2, (y0 + y1) // 2
+        quarters = [q for q in ((x0, mid_x, y0, mid_y), (mid_x, x1, y0, mid_y),
+                                (x0, mid_x, mid_y, y1), (mid_x, x1, mid_y, y1))
+                    if q[0] < q[1] and q[2] < q[3]]
+        values = [self.model.value_index.market_value(q[0], q[2], q[1] - 1, q[3] - 1, self.model.resource_values)
+                  for q in quarters]
+        if max(values) <= 0:
+            return bounds
+        return quarters[values.index(max(values))]
+
     def move_safely_towards(self, target_pos):
         current_x, current_y = self.pos
         target_x, target_y = target_pos
@@ -308,11 +369,14 @@ class ScoutDrone(Agent):
 
         self.model.grid.move_agent(self, next_pos)
 
-class MiningDrone(Agent):
+class MiningDrone(Drone):
+    rng = random
+
     def __init__(self, unique_id, model, base_pos, max_capacity=50, max_energy=150):
         super().__init__(unique_id, model)
         self.type = "miner"
-        self.base_pos = base_pos
+        self.home_pos = base_pos
+        self.base_pos = base_pos  # station the miner returns to, the nearest one once it heads back
         self.energy = max_energy
         self.max_energy = max_energy
         self.capacity = 0
@@ -337,13 +401,14 @@ class MiningDrone(Agent):
     def step(self):
         self.step_count += 1
         
-        if self.state != "malfunctioning" and random.random() < self.malfunction_chance:
+        if self.state != "malfunctioning" and self.breaks_down():
             self.state = "malfunctioning"
-            self.repair_time = random.randint(4, 10)
+            self.repair_time = self.rng.randint(4, 10)
             self.model.events.append(f"Miner {self.unique_id} malfunctioned!")
             return
 
         if self.state == "malfunctioning":
+            self.base_pos = self.model.nearest_station_pos(self.pos)
             if self.pos == self.base_pos:
                 self.repair_time -= 1
                 if self.repair_time <= 0:
@@ -397,16 +462,18 @@ class MiningDrone(Agent):
                 self.target_beacon = None
                 return
 
-            self.mine_resources()
+            remaining = self.mine_resources()
+            depleted = remaining is not None and remaining <= 0
 
-            if self.capacity >= self.max_capacity * 0.8 or (self.target_beacon and self.target_beacon.value <= 0):
+            if self.capacity >= self.max_capacity * 0.8 or depleted:
                 self.state = "returning"
-                if self.target_beacon and self.target_beacon.value <= 0:
+                if depleted:
                     self.clean_up_depleted_beacon()
 
                 self.target_beacon = None
 
         elif self.state == "returning":
+            self.base_pos = self.model.nearest_station_pos(self.pos)
             if self.pos == self.base_pos:
                 self.state = "recharging"
                 if self.capacity > 0:
@@ -427,12 +494,50 @@ class MiningDrone(Agent):
                 else:
                     self.model.events.append(f"Miner {self.unique_id} fully recharged and ready")
 
+    def predict_quiet_steps(self, max_steps):
+        # same contract as ScoutDrone.predict_quiet_steps; a miner parked at one cell
+        # trips the stuck check after five steps and then only counts down wait_time
+        trajectory = []
+        energy, wait_time, repair_time = self.energy, self.wait_time, self.repair_time
+        last_positions = list(self.last_positions)
+        for _ in range(max_steps):
+            if self.state == "malfunctioning":
+                if self.pos != self.model.nearest_station_pos(self.pos) or repair_time <= 1:
+                    break
+                repair_time -= 1
+            else:
+                last_positions.append(self.pos)
+                if len(last_positions) > 5:
+                    last_positions.pop(0)
+
+                if len(last_positions) == 5 and all(p == last_positions[0] for p in last_positions):
+                    if wait_time <= 0:
+                        break
+                    wait_time -= 1
+                elif self.state == "recharging":
+                    energy -= 1
+                    if energy < self.max_energy * 0.3:
+                        energy = min(energy + self.max_energy * 0.3, self.max_energy)
+                    else:
+                        energy = min(energy + self.max_energy * 0.1, self.max_energy)
+                    if energy >= self.max_energy:
+                        break
+                else:
+                    break
+            trajectory.append((energy, wait_time, repair_time, tuple(last_positions)))
+        return trajectory
+
+    def apply_quiet_step(self, values):
+        self.step_count += 1
+        self.energy, self.wait_time, self.repair_time, last_positions = values
+        if self.state == "malfunctioning":
+            self.base_pos = self.pos
+        self.last_positions = list(last_positions)
+
     def deliver_resources(self):
         for agent in self.model.grid.get_cell_list_contents([self.pos]):
             if hasattr(agent, 'type') and agent.type == "station":
-                agent.receive_resources(self.capacity, self.resource_type)
-                self.model.total_resources_collected += self.capacity
-                self.model.schedule.steps_stats["resources_delivered"] += self.capacity
+                self.model.receive_delivery(agent, self.capacity, self.resource_type)
 
                 self.model.events.append(f"Miner {self.unique_id} delivered {self.capacity} {self.resource_type}")
 
@@ -444,18 +549,7 @@ class MiningDrone(Agent):
         if not self.target_beacon:
             return
 
-        if self.target_beacon.asteroid:
-            self.target_beacon.asteroid.resource_value = 0
-            self.target_beacon.asteroid.is_depleted = True
-            self.model.events.append(f"Asteroid depleted: {self.target_beacon.resource_type}")
-
-        self.model.grid.remove_agent(self.target_beacon)
-        self.model.schedule.remove(self.target_beacon)
-        if self.target_beacon in self.model.active_beacons:
-            self.model.active_beacons.remove(self.target_beacon)
-
-        self.model.schedule.steps_stats["asteroids_depleted"] += 1
-        self.model.total_asteroids_depleted += 1 
+        self.model.retire_beacon(self.target_beacon)
 
     def find_optimal_beacon(self):
         if not self.model.active_beacons:
@@ -515,22 +609,20 @@ class MiningDrone(Agent):
             return
 
         mining_speed = self.mining_efficiency.get(self.target_beacon.resource_type, 3)
-        actual_mining_speed = max(1, int(mining_speed * random.uniform(0.8, 1.2)))
+        actual_mining_speed = max(1, int(mining_speed * self.rng.uniform(0.8, 1.2)))
         amount = min(actual_mining_speed, self.target_beacon.value, self.max_capacity - self.capacity)
 
-        self.target_beacon.value -= amount
-        if self.target_beacon.asteroid:
-            self.target_beacon.asteroid.resource_value = self.target_beacon.value
-        
+        remaining = self.model.draw_resources(self.target_beacon, amount)
         self.capacity += amount
 
         self.model.schedule.steps_stats["resources_mined"] += amount
 
-        if self.step_count % 5 == 0 or self.target_beacon.value <= 0:
-            if self.target_beacon.value <= 0:
+        if self.step_count % 5 == 0 or remaining <= 0:
+            if remaining <= 0:
                 self.model.events.append(f"Miner {self.unique_id} depleted asteroid, returning with {self.capacity} {self.resource_type}")
             else:
-                self.model.events.append(f"Miner {self.unique_id} mined {amount} {self.resource_type}, remaining: {self.target_beacon.value}")
+                self.model.events.append(f"Miner {self.unique_id} mined {amount} {self.resource_type}, remaining: {remaining}")
+        return remaining
 
     def random_move(self):
         possible_steps = self.model.grid.get_neighborhood(
@@ -545,10 +637,10 @@ class MiningDrone(Agent):
                 free_positions.append(pos)
 
         if free_positions:
-            new_position = random.choice(free_positions)
+            new_position = self.rng.choice(free_positions)
             self.model.grid.move_agent(self, new_position)
         else:
-            self.wait_time = random.randint(1, 3)
+            self.wait_time = self.rng.randint(1, 3)
 
     def move_safely_towards(self, target_pos):
         current_x, current_y = self.pos
@@ -618,8 +710,8 @@ class MiningDrone(Agent):
             if (target_x, target_y) in valid_moves:
                 next_pos = (target_x, target_y)
             else:
-                if random.random() < 0.7:  
-                    self.wait_time = random.randint(1, 2)
+                if self.rng.random() < 0.7:  
+                    self.wait_time = self.rng.randint(1, 2)
                     return
                 next_pos = min(valid_moves,
                                key=lambda m: abs(m[0] - target_x) + abs(m[1] - target_y))
@@ -629,13 +721,12 @@ class MiningDrone(Agent):
         self.model.grid.move_agent(self, next_pos)
 
 class ProcessingStation(Agent):
-    def __init__(self, unique_id, model):
+    def __init__(self, unique_id, model, lanes=1, batching=False, queue_policy="fifo"):
         super().__init__(unique_id, model)
         self.type = "station"
         self.resources = {"iron": 0, "gold": 0, "platinum": 0, "water": 0, "helium": 0}
         self.processed_resources = {"iron": 0, "gold": 0, "platinum": 0, "water": 0, "helium": 0}
-        self.processing_queue = [] 
-        self.processing_capacity = 15 
+        self.processing_capacity = 15  # units merged into one batch when batching
         self.processing_time = {
             "iron": 1,     
             "gold": 2,     
@@ -643,45 +734,129 @@ class ProcessingStation(Agent):
             "water": 1,
             "helium": 3    
         }  
-        self.currently_processing = None  # (resource_type, amount, remaining_time)
         self.total_processed = 0  
 
+        if queue_policy not in ("fifo", "value"):
+            raise ValueError(f"Unknown queue policy: {queue_policy}")
+        self.batching = batching
+        self.queue_policy = queue_policy
+
+        # one queue per resource type: a deque for fifo, a heap ordered by delivery value otherwise.
+        # entries are (priority, sequence, amount, received_step)
+        self.queues = {resource_type: deque() if queue_policy == "fifo" else [] for resource_type in self.resources}
+        self.queued_amounts = {resource_type: 0 for resource_type in self.resources}
+        self.queue_length = 0
+        self.sequence = 0
+
+        self.lanes = [None] * max(1, lanes)  # (resource_type, amount, remaining_time, [(amount, received_step)])
+        self.processed_this_step = 0
+        self.latency_total = 0
+
+    @property
+    def currently_processing(self):
+        batch = self.lanes[0]
+        return batch[:3] if batch else None
+
+    @property
+    def processing_queue(self):
+        entries = [(entry[1], resource_type, entry[2]) for resource_type, queue in self.queues.items() for entry in queue]
+        return [(resource_type, amount) for _, resource_type, amount in sorted(entries)]
+
+    @property
+    def average_latency(self):
+        return self.latency_total / max(1, self.total_processed)
+
     def step(self):
-        self.process_current_batch()
+        self.processed_this_step = 0
+        if self.queue_length or any(self.lanes):
+            self.model.mark_changed(self)
+
+        for lane in range(len(self.lanes)):
+            self.process_current_batch(lane)
 
-        if self.currently_processing is None and self.processing_queue:
-            self.start_new_batch()
+        for lane in range(len(self.lanes)):
+            if self.lanes[lane] is None and self.queue_length:
+                self.start_new_batch(lane)
 
     def receive_resources(self, amount, resource_type):
         if resource_type in self.resources:
             self.resources[resource_type] += amount
-            self.processing_queue.append((resource_type, amount))
+            self.sequence += 1
+            self.enqueue(resource_type, (self.sequence, amount, self.model.schedule.steps))
+            self.queue_length += 1
+            self.model.mark_changed(self)
+
+    def enqueue(self, resource_type, entry, front=False):
+        sequence, amount, received = entry
+        queue = self.queues[resource_type]
+        if self.queue_policy == "value":
+            heapq.heappush(queue, (-amount * self.model.resource_values.get(resource_type, 1), sequence, amount, received))
+        elif front:
+            queue.appendleft((sequence, sequence, amount, received))
+        else:
+            queue.append((sequence, sequence, amount, received))
+        self.queued_amounts[resource_type] += amount
+
+    def dequeue(self, resource_type):
+        queue = self.queues[resource_type]
+        _, sequence, amount, received = heapq.heappop(queue) if self.queue_policy == "value" else queue.popleft()
+        self.queued_amounts[resource_type] -= amount
+        return sequence, amount, received
 
-    def process_current_batch(self):
-        if self.currently_processing:
-            resource_type, amount, remaining_time = self.currently_processing
+    def next_resource_type(self):
+        # only the heads of the per-type queues are compared, so picking the next batch is O(types)
+        heads = [(queue[0], resource_type) for resource_type, queue in self.queues.items() if queue]
+        return min(heads)[1] if heads else None
+
+    def process_current_batch(self, lane=0):
+        if self.lanes[lane]:
+            resource_type, amount, remaining_time, parts = self.lanes[lane]
 
             remaining_time -= 1
 
             if remaining_time <= 0:
                 self.processed_resources[resource_type] += amount
                 self.total_processed += amount
+                self.processed_this_step += amount
+                self.latency_total += sum(part * (self.model.schedule.steps - received) for part, received in parts)
 
                 self.model.events.append(f"Station processed {amount} {resource_type}")
 
-                self.currently_processing = None
+                self.lanes[lane] = None
             else:
-                self.currently_processing = (resource_type, amount, remaining_time)
+                self.lanes[lane] = (resource_type, amount, remaining_time, parts)
 
-    def start_new_batch(self):
-        if not self.processing_queue:
+    def start_new_batch(self, lane=0):
+        resource_type = self.next_resource_type()
+        if resource_type is None:
             return
 
-        resource_type, amount = self.processing_queue.pop(0)
+        sequence, amount, received = self.dequeue(resource_type)
+        self.queue_length -= 1
+        parts = [(amount, received)]
+
+        if self.batching:
+            # merge same-type deliveries up to capacity; an oversized delivery is split and
+            # its remainder goes back to the head of its queue
+            if amount > self.processing_capacity:
+                self.enqueue(resource_type, (sequence, amount - self.processing_capacity, received), front=True)
+                self.queue_length += 1
+                amount = self.processing_capacity
+                parts = [(amount, received)]
+
+            while self.queues[resource_type] and amount < self.processing_capacity:
+                sequence, extra, received = self.dequeue(resource_type)
+                self.queue_length -= 1
+                taken = min(extra, self.processing_capacity - amount)
+                if taken < extra:
+                    self.enqueue(resource_type, (sequence, extra - taken, received), front=True)
+                    self.queue_length += 1
+                amount += taken
+                parts.append((taken, received))
 
         processing_time = self.processing_time.get(resource_type, 2)
 
-        self.currently_processing = (resource_type, amount, processing_time)
+        self.lanes[lane] = (resource_type, amount, processing_time, parts)
 
         self.model.events.append(f"Station started processing {amount} {resource_type}")
 
@@ -689,11 +864,36 @@ class Asteroid(Agent):
     def __init__(self, unique_id, model, resource_type, resource_value):
         super().__init__(unique_id, model)
         self.type = "asteroid"
+        self.indexed = False  # set once the model's region index counts this asteroid
         self.resource_type = resource_type
         self.resource_value = resource_value 
         self.original_value = resource_value 
         self.is_depleted = False
 
+    # value changes are pushed to the region index as they happen
+    @property
+    def resource_value(self):
+        return self._resource_value
+
+    @resource_value.setter
+    def resource_value(self, value):
+        if self.indexed and not self._is_depleted:
+            self.model.value_index.update(self.pos, self.resource_type, value - self._resource_value, 0)
+        self._resource_value = value
+        self.model.mark_changed(self)
+
+    @property
+    def is_depleted(self):
+        return self._is_depleted
+
+    @is_depleted.setter
+    def is_depleted(self, depleted):
+        if self.indexed and depleted != self._is_depleted:
+            sign = -1 if depleted else 1
+            self.model.value_index.update(self.pos, self.resource_type, sign * self._resource_value, sign)
+        self._is_depleted = depleted
+        self.model.mark_changed(self)
+
     def step(self):
         if self.resource_value <= 0 and not self.is_depleted:
             self.is_depleted = True
@@ -761,7 +961,7 @@ class SolarRadiation(Agent):
                 for pos in self.affected_area:
                     cell_contents = self.model.grid.get_cell_list_contents([pos])
                     for agent in cell_contents:
-                        if hasattr(agent, 'type') and (agent.type == "scout" or agent.type == "miner"):
+                        if hasattr(agent, 'type') and (agent.type == "scout" or agent.type == "miner") and not getattr(agent, 'ghost', False):
                             before_energy = agent.energy
                             agent.energy = max(0, agent.energy - self.damage)
                             drones_affected += 1
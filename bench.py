@@ -0,0 +1,236 @@
+from model import AsteroidMiningColony
+
+import argparse
+import json
+import os
+import pickle
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+# colony parameters of each scenario, on top of the model defaults
+SCENARIOS = {
+    "default": {},
+    "many_asteroids": {"width": 100, "height": 100, "num_asteroids": 2000},
+    "large_fleet": {"num_scouts": 40, "num_miners": 80},
+    "large_map": {"width": 400, "height": 400, "num_asteroids": 1000},
+    "high_radiation": {"radiation_probability": 0.2},
+}
+
+# a map big enough for tiles to pay for their exchange, stepped serially and on each tiling
+SCALING_PARAMS = {"width": 400, "height": 400, "num_asteroids": 8000, "num_scouts": 40, "num_miners": 80}
+SCALING_TILES = [(1, 1), (2, 1), (2, 2), (4, 2), (4, 4)]
+
+# metric -> (direction, allowed relative change before it counts as a regression);
+# timings get more room than memory because they move with machine load
+THRESHOLDS = {
+    "construct_seconds": ("lower", 0.25),
+    "steps_per_second": ("higher", 0.15),
+    "latency_p50_ms": ("lower", 0.20),
+    "latency_p99_ms": ("lower", 0.50),
+    "peak_memory_bytes": ("lower", 0.10),
+    "collector_bytes_per_step": ("lower", 0.05),
+}
+
+def collector_bytes(model):
+    # the collected history as it would be stored, a stable proxy for what it retains
+    collector = model.datacollector
+    return len(pickle.dumps((collector.model_vars, collector._agent_records, collector.tables)))
+
+def run_scenario(params, steps, seed, memory=True):
+    start = time.perf_counter()
+    model = AsteroidMiningColony(seed=seed, **params)
+    construct = time.perf_counter() - start
+    model.random.seed(seed)
+    collected = collector_bytes(model)
+
+    latencies = np.empty(steps)
+    for i in range(steps):
+        start = time.perf_counter()
+        model.step()
+        latencies[i] = time.perf_counter() - start
+
+    result = {
+        "params": params,
+        "steps": steps,
+        "construct_seconds": construct,
+        "steps_per_second": steps / latencies.sum(),
+        "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "latency_p90_ms": float(np.percentile(latencies, 90) * 1000),
+        "latency_p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "latency_max_ms": float(latencies.max() * 1000),
+        "collector_bytes": collector_bytes(model),
+        "collector_bytes_per_step": (collector_bytes(model) - collected) / steps,
+        "total_resources": model.total_resources_collected,
+    }
+
+    # tracing slows every allocation down, so peak memory comes from a second, untimed run
+    if memory:
+        tracemalloc.start()
+        model = AsteroidMiningColony(seed=seed, **params)
+        model.random.seed(seed)
+        for _ in range(steps):
+            model.step()
+        result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result
+
+def run_scaling(tilings=SCALING_TILES, steps=100, seed=1, params=SCALING_PARAMS):
+    # steps per second of PartitionedColony on every tiling, and its speedup over the first one;
+    # that is only meaningful with at least as many cores as workers, so the core count is kept.
+    # The serial model is a reference only: unlike the tiles it runs the data collector per step
+    from partition import PartitionedColony
+
+    model = AsteroidMiningColony(seed=seed, **params)
+    start = time.perf_counter()
+    for _ in range(steps):
+        model.step()
+    serial = steps / (time.perf_counter() - start)
+
+    rows = []
+    for tiles in tilings:
+        with PartitionedColony(tiles=tiles, seed=seed, **params) as colony:
+            start = time.perf_counter()
+            for _ in range(steps):
+                colony.step()
+            rate = steps / (time.perf_counter() - start)
+        rows.append({"tiles": f"{tiles[0]}x{tiles[1]}", "workers": tiles[0] * tiles[1],
+                     "steps_per_second": rate, "speedup": rate / (rows[0]["steps_per_second"] if rows else rate)})
+    return {"params": params, "steps": steps, "cpus": os.cpu_count(),
+            "serial_steps_per_second": serial, "tilings": rows}
+
+def run_benchmarks(scenarios=None, steps=300, seed=1, memory=True):
+    names = scenarios or list(SCENARIOS)
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": seed,
+        "scenarios": {},
+    }
+    for name in names:
+        results["scenarios"][name] = run_scenario(SCENARIOS[name], steps, seed, memory)
+    return results
+
+# modules of the web interface a headless run must not import
+WEB_MODULES = ("server", "canvas", "raster", "charts", "live", "broadcast", "tornado")
+
+# what a headless run imports and builds before its first step, timed in a fresh interpreter;
+# mesa 1.2.1 imports its own visualization (and tornado with it) from mesa/__init__, so only
+# web modules that arrive after mesa are reported
+STARTUP_PROBE = """
+import sys, time
+start = time.perf_counter()
+import mesa
+with_mesa = set(sys.modules)
+import cli, run
+from model import AsteroidMiningColony
+AsteroidMiningColony()
+elapsed = time.perf_counter() - start
+print(elapsed, ",".join(name for name in %r if name in sys.modules and name not in with_mesa))
+""" % (WEB_MODULES,)
+
+def measure_startup(repeats=3):
+    # best of a few runs: (wall seconds of the whole interpreter, seconds of import and construction,
+    # web modules that got imported)
+    here = os.path.dirname(os.path.abspath(__file__))
+    runs = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        output = subprocess.run([sys.executable, "-c", STARTUP_PROBE], cwd=here, check=True,
+                                capture_output=True, text=True).stdout.split()
+        wall = time.perf_counter() - start
+        runs.append((wall, float(output[0]), output[1].split(",") if len(output) > 1 else []))
+    return min(runs)
+
+def compare(results, baseline, slack=1.0):
+    # (scenario, metric, baseline, current, relative change, regressed) for every metric both runs have
+    rows = []
+    for name, current in results["scenarios"].items():
+        reference = baseline["scenarios"].get(name)
+        if reference is None or reference.get("steps") != current["steps"]:
+            continue
+        for metric, (direction, threshold) in THRESHOLDS.items():
+            if metric not in current or metric not in reference:
+                continue
+            before, after = reference[metric], current[metric]
+            change = (after - before) / before if before else 0.0
+            worse = -change if direction == "higher" else change
+            rows.append((name, metric, before, after, change, worse > threshold * slack))
+    return rows
+
+def print_results(results):
+    print(f"--- Benchmarks (Python {results['python']}, seed {results['seed']}) ---")
+    for name, result in results["scenarios"].items():
+        print(f"{name:>15}: construct {result['construct_seconds'] * 1000:.1f}ms  "
+              f"{result['steps_per_second']:.1f} steps/s  "
+              f"p50 {result['latency_p50_ms']:.2f}ms  p90 {result['latency_p90_ms']:.2f}ms  "
+              f"p99 {result['latency_p99_ms']:.2f}ms  "
+              f"collector +{result['collector_bytes_per_step']:.0f}B/step", end="")
+        if "peak_memory_bytes" in result:
+            print(f"  peak {result['peak_memory_bytes'] / 2 ** 20:.1f}MiB", end="")
+        print()
+
+def print_scaling(scaling):
+    print(f"\n--- Tile scaling ({scaling['cpus']} CPUs, {scaling['steps']} steps) ---")
+    print(f"{'serial':>15}: {scaling['serial_steps_per_second']:.1f} steps/s (with data collection)")
+    first = scaling["tilings"][0]["tiles"] if scaling["tilings"] else ""
+    for row in scaling["tilings"]:
+        print(f"{row['tiles']:>15}: {row['steps_per_second']:.1f} steps/s  "
+              f"{row['speedup']:.2f}x {first} with {row['workers']} workers")
+
+def print_comparison(rows):
+    print("\n--- Against baseline ---")
+    for name, metric, before, after, change, regressed in rows:
+        flag = "REGRESSION" if regressed else "ok"
+        print(f"{name:>15} {metric:>25}: {before:.4g} -> {after:.4g} ({change:+.1%}) {flag}")
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Benchmark colony construction, step throughput and memory")
+    parser.add_argument("--scenarios", nargs="+", choices=list(SCENARIOS), default=None,
+                        help="Scenarios to run (default: all)")
+    parser.add_argument("--steps", type=int, default=300, help="Steps per scenario")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for every scenario")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced run that measures peak memory")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare against the results in this JSON file")
+    parser.add_argument("--slack", type=float, default=1.0, help="Multiplier on every regression threshold")
+    parser.add_argument("--scaling", action="store_true",
+                        help="Also measure partitioned throughput against the serial model on growing tilings")
+    parser.add_argument("--tiles", nargs="+", type=lambda value: tuple(int(n) for n in value.split("x")),
+                        default=SCALING_TILES, help="Tilings for --scaling, e.g. 1x1 2x2 4x4")
+    parser.add_argument("--startup", action="store_true",
+                        help="Only check that importing and building the headless path fits --startup-budget")
+    parser.add_argument("--startup-budget", type=float, default=1.5,
+                        help="Seconds allowed for importing the headless path and building a colony")
+
+    args = parser.parse_args(argv)
+    if args.startup:
+        wall, elapsed, web = measure_startup()
+        print(f"Headless startup: {elapsed:.3f}s to import and build a colony "
+              f"({wall:.3f}s with the interpreter), budget {args.startup_budget:.3f}s")
+        if web:
+            print(f"Web modules imported on the headless path: {', '.join(web)}")
+        sys.exit(1 if web or elapsed > args.startup_budget else 0)
+
+    results = run_benchmarks(args.scenarios, args.steps, args.seed, not args.no_memory)
+    if args.scaling:
+        results["scaling"] = run_scaling(args.tiles, args.steps, args.seed)
+    print_results(results)
+    if args.scaling:
+        print_scaling(results["scaling"])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            rows = compare(results, json.load(f), args.slack)
+        print_comparison(rows)
+        if any(row[-1] for row in rows):
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import os
+
+import tornado.escape
+import tornado.websocket
+from mesa.visualization.ModularVisualization import ModularServer, SocketHandler, VisualizationElement
+
+class BroadcastSocketHandler(SocketHandler):
+    # Only the controller session steps, resets or changes parameters; every other session
+    # is a read-only viewer. A viewer's reset (sent when its page loads) just asks for a
+    # keyframe so it can start drawing from the shared stream.
+    def open(self):
+        super().open()
+        self.application.join(self)
+
+    def on_close(self):
+        self.application.leave(self)
+
+    def on_message(self, message):
+        msg = tornado.escape.json_decode(message)
+        application = self.application
+        if self is not application.controller:
+            if msg["type"] == "reset":
+                application.catch_up(self)
+            return
+        if msg["type"] == "get_step":
+            if not application.model.running:
+                application.send_all({"type": "end"})
+            else:
+                application.model.step()
+                application.broadcast()
+        elif msg["type"] == "reset":
+            application.reset_model()
+            application.broadcast()
+        else:
+            super().on_message(message)
+
+class BroadcastServer(ModularServer):
+    # One model for every browser: each tick of the controller's page steps it once, and the
+    # rendered frame is serialized once and written to every open session. A viewer that joins
+    # late gets a keyframe of its own from the elements that send deltas (DeltaCanvasGrid and
+    # RasterHeatmap). When the controller leaves, the longest-connected viewer takes over.
+    def __init__(self, *args, **kwargs):
+        self.sessions = []
+        super().__init__(*args, **kwargs)
+        self.add_handlers(r".*", [(r"/ws", BroadcastSocketHandler)])
+
+    @property
+    def controller(self):
+        return self.sessions[0] if self.sessions else None
+
+    def join(self, session):
+        self.sessions.append(session)
+        self.announce()
+
+    def leave(self, session):
+        if session in self.sessions:
+            self.sessions.remove(session)
+            self.announce()
+
+    def announce(self):
+        for session in list(self.sessions):
+            self.write(session, {"type": "role", "controller": session is self.controller,
+                                 "viewers": len(self.sessions)})
+
+    def send_all(self, message):
+        message = tornado.escape.json_encode(message)
+        for session in list(self.sessions):
+            self.write(session, message)
+
+    def write(self, session, message):
+        try:
+            session.write_message(message)
+        except tornado.websocket.WebSocketClosedError:
+            self.leave(session)
+
+    def broadcast(self):
+        self.send_all({"type": "viz_state", "data": self.render_model()})
+
+    def catch_up(self, session):
+        # a full frame matching what everybody else is showing, for this session only; delta
+        # elements build it from what they already sent, so the shared stream carries on as is
+        frame = [element.keyframe(self.model) if hasattr(element, "keyframe") else element.render(self.model)
+                 for element in self.visualization_elements]
+        self.write(session, {"type": "viz_state", "data": frame})
+
+class BroadcastStatus(VisualizationElement):
+    # Shows the session's role and the number of open sessions, hides the run controls on
+    # viewer pages and keeps their step counter in line with the shared model.
+    local_includes = ["BroadcastModule.js"]
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+    js_code = "elements.push(new BroadcastModule());"
+
+    def render(self, model):
+        return {"step": model.step_counter}
@@ -0,0 +1,112 @@
+import os
+
+from mesa.visualization.ModularVisualization import VisualizationElement
+
+class DeltaCanvasGrid(VisualizationElement):
+    # A drop-in for mesa's CanvasGrid that only sends what changed since the last frame.
+    # Portrayals are cached per agent; each frame carries the entries that were added or
+    # changed and the keys of the agents that disappeared, so asteroids and stations go out
+    # once and are only resent when they are mined or start processing. Drones and beacons
+    # change nearly every step and are portrayed every frame; asteroids and stations are only
+    # portrayed again when the colony reports them changed (watch_changes), so a frame costs
+    # O(drones + beacons + changes) rather than O(agents). A replay rebuilds its agents on every
+    # seek and has no such reports, so it is portrayed in full and diffed. The browser keeps one
+    # canvas per layer and only redraws the layers a frame touched (DeltaCanvasModule.js).
+    # A new model object (reset, or a replay seek that rebuilt it) starts over with a full frame.
+    package_includes = ["GridDraw.js"]
+    local_includes = ["DeltaCanvasModule.js"]
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def __init__(self, portrayal_method, grid_width, grid_height, canvas_width=500, canvas_height=500):
+        self.portrayal_method = portrayal_method
+        self.grid_width = grid_width
+        self.grid_height = grid_height
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.model = None
+        self.sent = {}
+        self.moving = set()  # keys of the drones and beacons in the last frame
+        self.changed = None  # the model's watch_changes set, when it keeps one
+        self.js_code = (f"elements.push(new DeltaCanvasModule({canvas_width}, {canvas_height}, "
+                        f"{grid_width}, {grid_height}));")
+
+    def agents(self, model):
+        # everything a live colony or a replay keeps on its grid; storms are not on the grid
+        for group in (model.stations, model.asteroids, model.active_beacons, model.scouts, model.miners):
+            for agent in group:
+                if agent.pos is not None:
+                    yield agent
+
+    def portray(self, agent):
+        portrayal = self.portrayal_method(agent)
+        if portrayal:
+            portrayal["x"], portrayal["y"] = agent.pos
+        return portrayal
+
+    def portrayals(self, model):
+        frame = {}
+        for agent in self.agents(model):
+            portrayal = self.portray(agent)
+            if portrayal:
+                frame[f"{agent.type}:{agent.unique_id}"] = portrayal
+        return frame
+
+    def attach(self, model):
+        if self.changed is not None:
+            self.model.unwatch_changes(self.changed)
+        self.model = model
+        self.changed = model.watch_changes() if hasattr(model, "watch_changes") else None
+
+    def render(self, model):
+        if model is not self.model:
+            self.attach(model)
+            self.sent = self.portrayals(model)
+            self.moving = {key for key in self.sent if key.split(":")[0] in ("scout", "miner", "beacon")}
+            return {"full": True, "changed": dict(self.sent), "removed": []}
+        if self.changed is None:
+            return self.diff(self.portrayals(model))
+
+        sent = self.sent
+        changed, removed = {}, []
+        moving = {}
+        for group in (model.active_beacons, model.scouts, model.miners):
+            for agent in group:
+                if agent.pos is not None:
+                    moving[f"{agent.type}:{agent.unique_id}"] = agent
+        for key in self.moving - moving.keys():
+            if sent.pop(key, None) is not None:
+                removed.append(key)
+        self.moving = set(moving)
+
+        dirty = {f"{agent.type}:{agent.unique_id}": agent for agent in self.changed}
+        self.changed.clear()
+        for key, agent in list(moving.items()) + list(dirty.items()):
+            # an evicted asteroid has left the grid
+            portrayal = self.portray(agent) if agent.pos is not None else None
+            if not portrayal:
+                if sent.pop(key, None) is not None:
+                    removed.append(key)
+            elif sent.get(key) != portrayal:
+                sent[key] = changed[key] = portrayal
+        return {"full": False, "changed": changed, "removed": removed}
+
+    def diff(self, frame):
+        sent = self.sent
+        changed = {key: portrayal for key, portrayal in frame.items() if sent.get(key) != portrayal}
+        removed = [key for key in sent if key not in frame]
+        self.sent = frame
+        return {"full": False, "changed": changed, "removed": removed}
+
+    def keyframe(self, model):
+        # a full frame of what the browsers already have, for a client joining an ongoing stream
+        portrayals = self.sent if model is self.model else self.portrayals(model)
+        return {"full": True, "changed": dict(portrayals), "removed": []}
+
+    def reset(self):
+        # forget what the browser has, so the next frame is a full one
+        if self.changed is not None:
+            self.model.unwatch_changes(self.changed)
+        self.model = None
+        self.changed = None
+        self.sent = {}
+        self.moving = set()
@@ -0,0 +1,129 @@
+import json
+import math
+import os
+
+import tornado.web
+from mesa.visualization.ModularVisualization import CHART_JS_FILE, VisualizationElement
+
+class MinMaxPyramid:
+    # One series at every power-of-two resolution. levels[k] holds a (min, argmin, max, argmax)
+    # tuple for each complete bucket of 2 ** (k + 1) points; points are added one at a time
+    # and each completed bucket is merged into the level above, so appending is amortized O(1).
+    # The extremes of any index range come from O(log n) buckets.
+    def __init__(self):
+        self.values = []
+        self.levels = []
+
+    def append(self, value):
+        i = len(self.values)
+        self.values.append(value)
+        if not i & 1:
+            return
+        bucket = self.merge((self.values[i - 1], i - 1, self.values[i - 1], i - 1), (value, i, value, i))
+        j, k = i >> 1, 0
+        while True:
+            if k == len(self.levels):
+                self.levels.append([])
+            self.levels[k].append(bucket)
+            if not j & 1:
+                return
+            bucket = self.merge(self.levels[k][j - 1], bucket)
+            j, k = j >> 1, k + 1
+
+    @staticmethod
+    def merge(a, b):
+        low = a if a[0] <= b[0] else b
+        high = a if a[2] >= b[2] else b
+        return (low[0], low[1], high[2], high[3])
+
+    def extent(self, start, end):
+        # (min, argmin, max, argmax) of values[start:end], from the largest aligned buckets that fit
+        result = None
+        while start < end:
+            m = 0
+            while (m < len(self.levels) and not start % (2 << m) and start + (2 << m) <= end
+                   and start >> (m + 1) < len(self.levels[m])):
+                m += 1
+            if m:
+                bucket = self.levels[m - 1][start >> m]
+            else:
+                bucket = (self.values[start], start, self.values[start], start)
+            result = bucket if result is None else self.merge(result, bucket)
+            start += 1 << m
+        return result
+
+    def window(self, start, end, points):
+        # about `points` (x, y) pairs tracing values[start:end]: every point when they fit,
+        # otherwise the min and the max of each bucket, in the order they occurred
+        end = min(end, len(self.values))
+        start = max(0, min(start, end))
+        buckets = max(1, points // 2)
+        if end - start <= points:
+            return list(range(start, end)), self.values[start:end]
+        size = 2 ** math.ceil(math.log2((end - start) / buckets))
+        xs, ys = [], []
+        for left in range(start - start % size, end, size):
+            low, low_x, high, high_x = self.extent(max(left, start), min(left + size, end))
+            for x, y in sorted({(low_x, low), (high_x, high)}):
+                xs.append(x)
+                ys.append(y)
+        return xs, ys
+
+class DownsampledChart(VisualizationElement):
+    # A line chart whose frames never grow with the length of the run. Every row the data
+    # collector adds goes into a MinMaxPyramid per series, and each frame carries the whole
+    # run traced with at most one point per pixel of chart width. Zooming in the browser asks
+    # ChartWindowHandler for the visible range at full detail (see serve_chart_windows).
+    # A new model, or one whose series got shorter (a replay going backward), starts over.
+    package_includes = [CHART_JS_FILE]
+    local_includes = ["DownsampledChartModule.js"]
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def __init__(self, series, canvas_height=200, canvas_width=500, data_collector_name="datacollector"):
+        self.series = series
+        self.canvas_height = canvas_height
+        self.canvas_width = canvas_width
+        self.data_collector_name = data_collector_name
+        self.model = None
+        self.pyramids = []
+        self.js_code = (f"elements.push(new DownsampledChartModule({json.dumps(series)}, "
+                        f"{canvas_width}, {canvas_height}));")
+
+    def update(self, model):
+        model_vars = getattr(model, self.data_collector_name).model_vars
+        columns = [model_vars.get(s["Label"], []) for s in self.series]
+        rows = min(len(column) for column in columns)
+        if model is not self.model or rows < self.rows:
+            self.model = model
+            self.pyramids = [MinMaxPyramid() for _ in self.series]
+        for pyramid, column in zip(self.pyramids, columns):
+            for value in column[len(pyramid.values):rows]:
+                pyramid.append(float(value))
+
+    @property
+    def rows(self):
+        return len(self.pyramids[0].values) if self.pyramids else 0
+
+    def window(self, start, end, points):
+        return {"rows": self.rows, "start": start, "end": end,
+                "series": [pyramid.window(start, end, points) for pyramid in self.pyramids]}
+
+    def render(self, model):
+        self.update(model)
+        return self.window(0, self.rows, self.canvas_width)
+
+class ChartWindowHandler(tornado.web.RequestHandler):
+    # GET /chart/<element index>?start=&end=&points= -> one range of a DownsampledChart
+    def get(self, index):
+        application = self.application
+        element = application.visualization_elements[int(index)]
+        start, end = int(self.get_argument("start")), int(self.get_argument("end"))
+        points = min(int(self.get_argument("points")), 4 * element.canvas_width)
+        # a live server's model moves on its own thread; read the chart between two steps
+        worker = getattr(application, "worker", None)
+        window = lambda: element.window(start, end, points)
+        self.write(worker.sample(window) if worker else window())
+
+def serve_chart_windows(server):
+    server.add_handlers(r".*", [(r"/chart/(\d+)", ChartWindowHandler)])
+    return server
@@ -0,0 +1,58 @@
+import os
+import pickle
+import random
+import struct
+import zlib
+
+CHECKPOINT_MAGIC = b"AMCK"
+CHECKPOINT_VERSION = 2
+
+# magic, format version, flags (reserved), model step, payload crc32, payload length
+HEADER = struct.Struct("<4sHHIIQ")
+
+def dumps(model, compression_level=6):
+    # the colony draws from the global random module as well as model.random, so
+    # both streams are saved to make a resumed run continue exactly where it stopped
+    payload = pickle.dumps({"model": model, "random_state": random.getstate()},
+                           protocol=pickle.HIGHEST_PROTOCOL)
+    payload = zlib.compress(payload, compression_level)
+    header = HEADER.pack(CHECKPOINT_MAGIC, CHECKPOINT_VERSION, 0,
+                         model.step_counter, zlib.crc32(payload), len(payload))
+    return header + payload
+
+def read_header(data):
+    if len(data) < HEADER.size:
+        raise ValueError("Checkpoint is truncated")
+
+    magic, version, flags, step, crc, length = HEADER.unpack_from(data)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError("Not a colony checkpoint")
+    if version != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version {version} (expected {CHECKPOINT_VERSION})")
+
+    return {"version": version, "flags": flags, "step": step, "crc": crc, "length": length}
+
+def loads(data, restore_random=True):
+    header = read_header(data)
+    payload = data[HEADER.size:HEADER.size + header["length"]]
+    if len(payload) != header["length"] or zlib.crc32(payload) != header["crc"]:
+        raise ValueError("Checkpoint payload is corrupted")
+
+    state = pickle.loads(zlib.decompress(payload))
+    if restore_random:
+        random.setstate(state["random_state"])
+    return state["model"]
+
+def save_checkpoint(model, path, compression_level=6):
+    data = dumps(model, compression_level)
+
+    # write next to the target and swap it in, so an interrupted save never leaves a broken file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return len(data)
+
+def load_checkpoint(path, restore_random=True):
+    with open(path, "rb") as f:
+        return loads(f.read(), restore_random)
@@ -0,0 +1,30 @@
+import argparse
+import importlib
+
+# subcommand -> (module whose main() it runs, arguments put in front of the user's, summary).
+# The module is only imported once its command is chosen, so `run`, `sweep` and `bench` never
+# load the web interface; only `serve` imports server.py.
+COMMANDS = {
+    "run": ("run", ["--headless"], "Run a headless simulation (options of run.py)"),
+    "serve": ("run", [], "Serve the web interface, live, shared or as a replay (options of run.py)"),
+    "sweep": ("search", [], "Search fleet compositions with successive halving (options of search.py)"),
+    "bench": ("bench", [], "Benchmark throughput, memory and startup (options of bench.py)"),
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="asteroid-mining", description="Asteroid Mining Colony Simulation",
+                                     epilog="\n".join(f"  {name:<6} {summary}" for name, (_, _, summary)
+                                                      in COMMANDS.items()),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=list(COMMANDS), help="What to do; see the list below")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Options of the command (try <command> --help)")
+
+    args = parser.parse_args(argv)
+    module_name, prefix, _ = COMMANDS[args.command]
+    if args.command == "serve" and "--headless" in args.args:
+        parser.error("serve always starts the web interface; use 'run' for a headless simulation")
+    module = importlib.import_module(module_name)
+    module.main(prefix + args.args, prog=f"asteroid-mining {args.command}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import tornado.escape
+from mesa.visualization.ModularVisualization import ModularServer, SocketHandler
+
+class SimulationWorker(threading.Thread):
+    # Steps a model on its own thread for as long as a viewer keeps asking for frames.
+    # Frames are rendered between two steps, never during one: while the worker is busy a
+    # sample() is queued and served right after the current step, and while it is paused
+    # sample() renders directly with the condition held so no step can start meanwhile.
+    def __init__(self, model, idle_timeout=2.0):
+        super().__init__(daemon=True)
+        self.model = model
+        self.idle_timeout = idle_timeout
+        self.condition = threading.Condition()
+        self.requests = []
+        self.deadline = 0.0
+        self.busy = False
+        self.stopped = False
+        self.steps = 0
+
+    def should_run(self):
+        return not self.stopped and self.model.running and time.monotonic() < self.deadline
+
+    def run(self):
+        try:
+            while True:
+                with self.condition:
+                    self.busy = self.should_run()
+                    # samples queued just before the worker went idle render themselves
+                    self.condition.notify_all()
+                    while not self.busy:
+                        if self.stopped:
+                            return
+                        self.condition.wait()
+                        self.busy = self.should_run()
+                self.model.step()
+                with self.condition:
+                    self.steps += 1
+                    for render, frame in self.requests:
+                        frame.append(render())
+                    self.requests.clear()
+        finally:
+            with self.condition:
+                self.busy = False
+                self.stopped = True
+                self.condition.notify_all()
+
+    def sample(self, render):
+        # the result of render() on the latest completed step; asking keeps the worker going
+        with self.condition:
+            self.deadline = time.monotonic() + self.idle_timeout
+            if not self.busy:
+                self.condition.notify_all()
+                return render()
+            frame = []
+            self.requests.append((render, frame))
+            self.condition.wait_for(lambda: frame or not self.busy)
+            return frame[0] if frame else render()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.join()
+
+class LiveSocketHandler(SocketHandler):
+    # get_step no longer steps the model: it returns whatever the worker has reached, so the
+    # browser's frame rate only decides how often the page is redrawn, not how fast the
+    # colony runs. Stopping the page pauses the worker once idle_timeout passes without a frame.
+    def on_message(self, message):
+        msg = tornado.escape.json_decode(message)
+        if msg["type"] != "get_step":
+            return super().on_message(message)
+        application = self.application
+        if not application.model.running:
+            self.write_message({"type": "end"})
+        else:
+            self.write_message({"type": "viz_state", "data": application.worker.sample(application.render_model)})
+
+class LiveServer(ModularServer):
+    # A ModularServer whose model steps continuously on a SimulationWorker at full speed.
+    # Use charts.DownsampledChart instead of ChartModule so skipped frames leave no gaps.
+    def __init__(self, *args, idle_timeout=2.0, **kwargs):
+        self.idle_timeout = idle_timeout
+        self.worker = None
+        super().__init__(*args, **kwargs)
+        self.add_handlers(r".*", [(r"/ws", LiveSocketHandler)])
+
+    def reset_model(self):
+        if self.worker is not None:
+            self.worker.stop()
+        super().reset_model()
+        self.worker = SimulationWorker(self.model, self.idle_timeout)
+        self.worker.start()
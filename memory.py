@@ -0,0 +1,126 @@
+import sys
+import tracemalloc
+import types
+from collections import defaultdict, deque
+
+import numpy as np
+from mesa import Agent, Model
+
+# Estimates of the memory a colony retains, for finding what grows over a long run.
+# Sizes are sys.getsizeof summed over everything reachable from a root, each object counted
+# once. Agents and the model are boundaries: a miner's size does not include the beacon it
+# targets or the model it points to. AsteroidMiningColony.memory_report() is the entry point.
+
+SKIPPED = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+def deep_sizeof(root, seen=None):
+    # seen is shared between calls that should not count the same object twice
+    seen = set() if seen is None else seen
+    size = 0
+    pending = [root]
+    while pending:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, SKIPPED):
+            continue
+        if obj is not root and isinstance(obj, (Agent, Model)):
+            continue
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            pending.extend(obj)
+        elif isinstance(obj, np.ndarray):
+            if obj.base is not None:
+                pending.append(obj.base)
+        else:
+            if hasattr(obj, "__dict__"):
+                pending.append(obj.__dict__)
+            for slot in getattr(type(obj), "__slots__", ()):
+                if hasattr(obj, slot):
+                    pending.append(getattr(obj, slot))
+    return size
+
+def subsystem_roots(model):
+    collector = model.datacollector
+    scouts = model.scouts
+    roots = {
+        "datacollector": [collector.model_vars, collector._agent_records, collector.tables],
+        "scout_visited_positions": [scout.visited_positions for scout in scouts],
+        "scout_analyzed_asteroids": [scout.analyzed_asteroids for scout in scouts],
+        "events": [model.events],
+        "grid": [model.grid],
+        "value_index": [model.value_index],
+        "station_lookup": [model.station_lookup],
+        "active_beacons": list(model.active_beacons),
+        "stale_beacons": stale_beacons(model),
+    }
+    if model.field is not None:
+        roots["procedural_field"] = [model.field]
+    return roots
+
+def stale_beacons(model):
+    # retired beacons still held by a miner; they live on until it picks a new target
+    active = {id(beacon) for beacon in model.active_beacons}
+    stale = {}
+    for miner in model.miners:
+        beacon = miner.target_beacon
+        if beacon is not None and id(beacon) not in active:
+            stale[id(beacon)] = beacon
+    return list(stale.values())
+
+def colony_memory_report(model, previous=None, top=10):
+    # subsystems share one seen set so none is charged for another's objects; agent types are
+    # a second, independent view of the same colony
+    seen = set()
+    subsystems = {}
+    for name, roots in subsystem_roots(model).items():
+        subsystems[name] = sum(deep_sizeof(root, seen) for root in roots)
+
+    agent_types = defaultdict(lambda: {"count": 0, "bytes": 0})
+    seen = set()
+    for agent in model.schedule.agents:
+        entry = agent_types[agent.type]
+        entry["count"] += 1
+        entry["bytes"] += deep_sizeof(agent, seen)
+
+    report = {
+        "step": model.step_counter,
+        "subsystems": subsystems,
+        "agent_types": dict(agent_types),
+        "collector_rows": len(next(iter(model.datacollector.model_vars.values()), [])),
+        "event_count": len(model.events),
+        "stale_beacon_count": len(stale_beacons(model)),
+    }
+
+    # with tracing on, the snapshot rides along so the next report can diff against it
+    if tracemalloc.is_tracing():
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ])
+        current, peak = tracemalloc.get_traced_memory()
+        report["tracemalloc"] = {"current": current, "peak": peak}
+        if previous is not None:
+            report["tracemalloc"]["growth"] = [
+                {"location": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                 "bytes": stat.size_diff, "blocks": stat.count_diff}
+                for stat in snapshot.compare_to(previous, "lineno")[:top]
+            ]
+        report["snapshot"] = snapshot
+    return report
+
+def print_memory_report(report, top=5):
+    print(f"\n--- Memory at step {report['step']} ---")
+    for name, size in sorted(report["subsystems"].items(), key=lambda item: -item[1]):
+        print(f"{name:>25}: {size / 1024:10.1f} KiB")
+    for agent_type, entry in sorted(report["agent_types"].items(), key=lambda item: -item[1]["bytes"]):
+        print(f"{agent_type:>25}: {entry['bytes'] / 1024:10.1f} KiB in {entry['count']} agents")
+    print(f"{'collector rows':>25}: {report['collector_rows']}, events kept: {report['event_count']}, "
+          f"stale beacons: {report['stale_beacon_count']}")
+    traced = report.get("tracemalloc")
+    if traced:
+        print(f"{'traced':>25}: {traced['current'] / 2 ** 20:.1f} MiB now, {traced['peak'] / 2 ** 20:.1f} MiB peak")
+        for stat in traced.get("growth", [])[:top]:
+            print(f"{stat['bytes'] / 1024:>+35.1f} KiB  {stat['blocks']:>+7} blocks  {stat['location']}")
@@ -4,8 +4,20 @@ from mesa.time import RandomActivation
 from mesa.datacollection import DataCollector
 
 from agents import ScoutDrone, MiningDrone, ProcessingStation, Asteroid, Beacon, SolarRadiation
-
+from routing import StationLookup
+from phased import PhasedActivation
+from space import SparseMultiGrid
+from world import ProceduralField
+from regions import RegionIndex
+from snapshot import SCOUT_STATES, MINER_STATES, colony_arrays
+from memory import colony_memory_report
+
+import json
+import math
+import os
 import random
+import selectors
+import signal
 import numpy as np
 from collections import defaultdict, deque
 
@@ -22,8 +34,29 @@ class AsteroidMiningColony(Model):
     def __init__(self, width=50, height=50,
                  num_scouts=5, num_miners=10,
                  num_asteroids=80, radiation_probability=0.01,
-                 resource_richness=1.0, scout_sensor_range=3):
+                 resource_richness=1.0, scout_sensor_range=3, seed=None,
+                 station_lanes=1, station_batching=False,
+                 station_queue_policy="fifo", num_stations=1, station_placement="grid",
+                 step_mode="sequential", phase_workers=0, space=None, world="static",
+                 value_aware_exploration=False, density=None, fast_forward=False):
         super().__init__()
+        if seed is not None:
+            random.seed(seed)
+        if step_mode not in ("sequential", "two_phase"):
+            raise ValueError(f"Unknown step mode: {step_mode}")
+        if world not in ("static", "procedural"):
+            raise ValueError(f"Unknown world mode: {world}")
+        # a procedural world only ever holds the chunks around the fleet, which a dense grid
+        # would defeat by allocating every cell of the map
+        if space is None:
+            space = "sparse" if world == "procedural" else "dense"
+        if space not in ("dense", "sparse"):
+            raise ValueError(f"Unknown space backend: {space}")
+        if world == "procedural" and space != "sparse":
+            raise ValueError("A procedural world needs space='sparse'")
+        if fast_forward and (step_mode != "sequential" or world != "static"):
+            raise ValueError("fast_forward needs step_mode='sequential' and a static world")
+
         self.width = width
         self.height = height
         self.num_scouts = num_scouts
@@ -32,17 +65,30 @@ class AsteroidMiningColony(Model):
         self.radiation_probability = radiation_probability
         self.resource_richness = resource_richness  # Multiplier for resource values
         self.scout_sensor_range = scout_sensor_range
-
-        self.grid = MultiGrid(width, height, torus=False)
-        self.schedule = CustomActivation(self)
-
-        self.base_pos = (width // 2, height // 2)
+        self.fast_forward = fast_forward
+        self.fast_forwarded_steps = 0
+        self.storm_due = None  # whether the step after a fast-forward jump brings a storm
+        self.step_mode = step_mode
+        self.space = space
+        self.value_aware_exploration = value_aware_exploration
+
+        self.grid = self.create_grid(width, height)
+        self.change_watchers = []  # sets collecting asteroids and stations whose portrayal changed
+        if step_mode == "two_phase":
+            self.schedule = PhasedActivation(self, workers=phase_workers)
+        else:
+            self.schedule = CustomActivation(self)
+
+        self.station_positions = self.place_stations(num_stations, station_placement)
+        self.base_pos = self.station_positions[0]
 
         self.active_beacons = []
         self.active_radiations = []
         self.scouts = []
         self.miners = []
+        self.count_states()
         self.asteroids = []
+        self.value_index = RegionIndex(width, height)
 
         self.events = deque(maxlen=15)  
 
@@ -59,42 +105,58 @@ class AsteroidMiningColony(Model):
             "helium": 20
         }
 
-        station = ProcessingStation(self.next_id(), self)
-        self.grid.place_agent(station, self.base_pos)
-        self.schedule.add(station)
-        self.station = station
-
-        self.create_asteroids()
-
-        for i in range(self.num_scouts):
-            scout = ScoutDrone(self.next_id(), self, self.base_pos, sensor_range=scout_sensor_range)
-            self.grid.place_agent(scout, self.base_pos)
-            self.schedule.add(scout)
-            self.scouts.append(scout)
-
-            if i % 3 == 0:
-                scout.exploration_pattern = "spiral"
-            elif i % 3 == 1:
-                scout.exploration_pattern = "sector"
-            else:
-                scout.exploration_pattern = "quadrant"
-
-        for i in range(self.num_miners):
-            miner = MiningDrone(self.next_id(), self, self.base_pos)
-            self.grid.place_agent(miner, self.base_pos)
-            self.schedule.add(miner)
-            self.miners.append(miner)
+        self.stations = []
+        for pos in self.station_positions:
+            station = ProcessingStation(self.next_id(), self, lanes=station_lanes,
+                                        batching=station_batching, queue_policy=station_queue_policy)
+            self.grid.place_agent(station, pos)
+            self.schedule.add(station)
+            self.stations.append(station)
+        self.station = self.stations[0]
+        self.station_lookup = StationLookup(width, height, self.station_positions)
+
+        self.field = None
+        if world == "static":
+            self.create_asteroids()
+
+        for _ in range(self.num_scouts):
+            self.create_scout()
+
+        for _ in range(self.num_miners):
+            self.create_miner()
+
+        if world == "procedural":
+            # chunks are generated as drones reach them; without an explicit density (asteroids
+            # per cell) num_asteroids is spread over the map
+            if density is None:
+                density = num_asteroids / (width * height)
+            if density < 0:
+                raise ValueError(f"density must not be negative, got {density}")
+            world_seed = seed if seed is not None else random.getrandbits(32)
+            self.field = ProceduralField(self, world_seed, density)
+            self.field.update()
+            self.events.append(f"Procedural field: {len(self.asteroids)} asteroids in {len(self.field.loaded)} chunks")
+
+        self.events.append(f"Colony initialized with {num_scouts} scouts, {num_miners} miners, and {len(self.asteroids)} asteroids")
+
+        self.datacollector = self.create_datacollector()
+        self.datacollector.collect(self)
 
-        self.events.append(f"Colony initialized with {num_scouts} scouts, {num_miners} miners, and {num_asteroids} asteroids")
+    def create_grid(self, width, height, torus=False):
+        # the sparse backend only allocates chunks that hold agents, for very large maps
+        if self.space == "sparse":
+            return SparseMultiGrid(width, height)
+        return MultiGrid(width, height, torus=torus)
 
-        self.datacollector = DataCollector(
+    def create_datacollector(self):
+        return DataCollector(
             model_reporters={
                 "Total Resources": lambda m: m.total_resources_collected,
-                "Iron Collected": lambda m: m.station.processed_resources["iron"],
-                "Gold Collected": lambda m: m.station.processed_resources["gold"],
-                "Platinum Collected": lambda m: m.station.processed_resources["platinum"],
-                "Water Collected": lambda m: m.station.processed_resources["water"],
-                "Helium Collected": lambda m: m.station.processed_resources["helium"],
+                "Iron Collected": lambda m: m.processed_resources["iron"],
+                "Gold Collected": lambda m: m.processed_resources["gold"],
+                "Platinum Collected": lambda m: m.processed_resources["platinum"],
+                "Water Collected": lambda m: m.processed_resources["water"],
+                "Helium Collected": lambda m: m.processed_resources["helium"],
                 "Active Beacons": lambda m: len(m.active_beacons),
                 "Radiation Events": lambda m: len(m.active_radiations),
                 "Scout Energy": lambda m: sum(s.energy for s in m.scouts) / max(1, len(m.scouts)),
@@ -102,7 +164,14 @@ class AsteroidMiningColony(Model):
                 "Asteroids Depleted": lambda m: m.total_asteroids_depleted,
                 "Emergency Returns": lambda m: m.schedule.steps_stats["emergency_returns"],
                 "Mining Efficiency": lambda m: self.calculate_mining_efficiency(),
-                "Total Value": lambda m: self.calculate_total_value()
+                "Total Value": lambda m: self.calculate_total_value(),
+                "Station Queue": lambda m: sum(s.queue_length for s in m.stations),
+                "Station Throughput": lambda m: sum(s.processed_this_step for s in m.stations),
+                "Station Latency": lambda m: sum(s.latency_total for s in m.stations) / max(1, sum(s.total_processed for s in m.stations)),
+                **{f"Scouts {state.replace('_', ' ').title()}": (lambda m, state=state: m.state_counts["scout"][state])
+                   for state in SCOUT_STATES},
+                **{f"Miners {state.replace('_', ' ').title()}": (lambda m, state=state: m.state_counts["miner"][state])
+                   for state in MINER_STATES}
             },
             agent_reporters={
                 "Energy": lambda a: getattr(a, "energy", 0) if hasattr(a, "type") and (a.type == "scout" or a.type == "miner") else 0,
@@ -113,7 +182,35 @@ class AsteroidMiningColony(Model):
             }
         )
 
-        self.datacollector.collect(self)
+    def __getstate__(self):
+        state = self.__dict__.copy()
+
+        # the reporters are lambdas and can't be pickled, and most grid cells are empty,
+        # so both are stored as plain data and rebuilt in __setstate__
+        positions = {agent.pos for agent in self.schedule.agents if agent.pos is not None}
+        cells = [(pos, self.grid.get_cell_list_contents([pos])) for pos in sorted(positions)]
+        state["grid"] = (self.grid.width, self.grid.height, self.grid.torus, cells)
+        state["change_watchers"] = []  # renderers watch the live colony, not a saved one
+        state["datacollector"] = (self.datacollector.model_vars,
+                                  self.datacollector._agent_records,
+                                  self.datacollector.tables)
+        return state
+
+    def __setstate__(self, state):
+        width, height, torus, cells = state["grid"]
+        model_vars, agent_records, tables = state["datacollector"]
+        self.__dict__.update(state)
+
+        # cell order is kept so neighbor scans break ties the same way after a restore
+        self.grid = self.create_grid(width, height, torus)
+        for pos, agents in cells:
+            for agent in agents:
+                self.grid.place_agent(agent, pos)
+
+        self.datacollector = self.create_datacollector()
+        self.datacollector.model_vars = model_vars
+        self.datacollector._agent_records = agent_records
+        self.datacollector.tables = tables
 
     def calculate_mining_efficiency(self):
         total_energy_used = sum((scout.max_energy - scout.energy) for scout in self.scouts)
@@ -124,19 +221,82 @@ class AsteroidMiningColony(Model):
 
         return self.total_resources_collected / max(1, total_energy_used)
 
+    @property
+    def processed_resources(self):
+        if len(self.stations) == 1:
+            return self.station.processed_resources
+
+        totals = dict.fromkeys(self.station.processed_resources, 0)
+        for station in self.stations:
+            for resource_type, amount in station.processed_resources.items():
+                totals[resource_type] += amount
+        return totals
+
+    def nearest_station_pos(self, pos):
+        return self.station_lookup.nearest(pos)
+
+    def place_stations(self, num_stations, placement):
+        if not isinstance(placement, str):
+            positions = [tuple(pos) for pos in placement]
+        elif num_stations < 1:
+            raise ValueError("The colony needs at least one station")
+        elif placement == "grid":
+            # centres of a near-square tiling of the map; a single station sits at the map centre
+            cols = math.ceil(math.sqrt(num_stations))
+            rows = math.ceil(num_stations / cols)
+            positions = [((2 * (i % cols) + 1) * self.width // (2 * cols),
+                          (2 * (i // cols) + 1) * self.height // (2 * rows))
+                         for i in range(num_stations)]
+        elif placement == "random":
+            positions = [(self.width // 2, self.height // 2)]
+            while len(positions) < num_stations:
+                pos = (random.randrange(self.width), random.randrange(self.height))
+                if pos not in positions:
+                    positions.append(pos)
+        else:
+            raise ValueError(f"Unknown station placement: {placement}")
+
+        if not positions or len(set(positions)) != len(positions):
+            raise ValueError("Station positions must be distinct and non-empty")
+        for x, y in positions:
+            if not (0 <= x < self.width and 0 <= y < self.height):
+                raise ValueError(f"Station position {(x, y)} is outside the map")
+        return positions
+
     def calculate_total_value(self):
         total_value = 0
-        for resource_type, amount in self.station.processed_resources.items():
+        for resource_type, amount in self.processed_resources.items():
             value_per_unit = self.resource_values.get(resource_type, 1)
             total_value += amount * value_per_unit
         return total_value
 
     def get_resource_distribution(self):
-        total = sum(self.station.processed_resources.values())
+        processed = self.processed_resources
+        total = sum(processed.values())
         if total == 0:
-            return {r: 0 for r in self.station.processed_resources}
-
-        return {r: (amount / total) * 100 for r, amount in self.station.processed_resources.items()}
+            return {r: 0 for r in processed}
+
+        return {r: (amount / total) * 100 for r, amount in processed.items()}
+
+    def get_kpis(self):
+        total_value = self.calculate_total_value()
+        cargo_value = sum(miner.capacity * self.resource_values.get(miner.resource_type, 0) for miner in self.miners)
+        for station in self.stations:
+            cargo_value += sum(amount * self.resource_values.get(r, 0) for r, amount in station.queued_amounts.items())
+            for batch in station.lanes:
+                if batch:
+                    cargo_value += batch[1] * self.resource_values.get(batch[0], 0)
+
+        return {
+            "step": self.step_counter,
+            "total_resources": self.total_resources_collected,
+            "total_value": total_value,
+            "operational_cost": self.operational_cost,
+            "asteroids_depleted": self.total_asteroids_depleted,
+            "efficiency": self.total_resources_collected / max(1, self.operational_cost),
+            "cargo_value": cargo_value,
+            "value_per_cost": total_value / max(1, self.operational_cost)
+        }
 
     def count_depleted_asteroids(self):
         return sum(1 for asteroid in self.asteroids if asteroid.is_depleted)
@@ -157,7 +317,7 @@ class AsteroidMiningColony(Model):
             while True:
                 x = random.randrange(self.width)
                 y = random.randrange(self.height)
-                if abs(x - self.base_pos[0]) > 5 or abs(y - self.base_pos[1]) > 5:
+                if all(abs(x - sx) > 5 or abs(y - sy) > 5 for sx, sy in self.station_positions):
                     break
 
             primary_resource = random.choices(resource_types, weights=resource_weights, k=1)[0]
@@ -197,9 +357,7 @@ class AsteroidMiningColony(Model):
                 resource_value = int(base_values[resource_type] * variation * self.resource_richness)
 
                 asteroid = Asteroid(self.next_id(), self, resource_type, resource_value)
-                self.grid.place_agent(asteroid, (x, y))
-                self.schedule.add(asteroid)
-                self.asteroids.append(asteroid)
+                self.place_asteroid(asteroid, (x, y))
 
                 asteroids_created += 1
 
@@ -207,7 +365,7 @@ class AsteroidMiningColony(Model):
             while True:
                 x = random.randrange(self.width)
                 y = random.randrange(self.height)
-                if abs(x - self.base_pos[0]) > 3 or abs(y - self.base_pos[1]) > 3:
+                if all(abs(x - sx) > 3 or abs(y - sy) > 3 for sx, sy in self.station_positions):
                     break
 
             resource_type = random.choices(resource_types, weights=resource_weights, k=1)[0]
@@ -224,55 +382,393 @@ class AsteroidMiningColony(Model):
             resource_value = int(base_values[resource_type] * variation * self.resource_richness)
 
             asteroid = Asteroid(self.next_id(), self, resource_type, resource_value)
-            self.grid.place_agent(asteroid, (x, y))
-            self.schedule.add(asteroid)
-            self.asteroids.append(asteroid)
+            self.place_asteroid(asteroid, (x, y))
 
             asteroids_created += 1
 
         self.events.append(f"Created {asteroids_created} asteroids total")
 
-    def generate_solar_radiation(self):
-        if random.random() < self.radiation_probability:
-            radiation = SolarRadiation(self.next_id(), self)
+    def place_asteroid(self, asteroid, pos):
+        self.grid.place_agent(asteroid, pos)
+        self.schedule.add(asteroid)
+        self.asteroids.append(asteroid)
+        self.value_index.add(asteroid)
+        self.mark_changed(asteroid)
+
+    def watch_changes(self):
+        # a set that from now on collects every asteroid and station whose portrayal may have
+        # changed (value, depletion, loading or eviction, station lanes and queue); the caller
+        # empties it as it consumes it
+        changed = set()
+        self.change_watchers.append(changed)
+        return changed
+
+    def unwatch_changes(self, changed):
+        self.change_watchers = [watched for watched in self.change_watchers if watched is not changed]
+
+    def mark_changed(self, agent):
+        for changed in self.change_watchers:
+            changed.add(agent)
+
+    def count_states(self):
+        # rebuilds the per-type state histogram the drones keep up to date as they change state,
+        # for code that adds or drops drones wholesale
+        self.state_counts = {"scout": dict.fromkeys(SCOUT_STATES, 0), "miner": dict.fromkeys(MINER_STATES, 0)}
+        for drone in self.scouts + self.miners:
+            self.state_counts[drone.type][drone.state] += 1
+
+    def remaining_value(self, x0=0, y0=0, x1=None, y1=None):
+        # remaining value and undepleted asteroid counts per resource in a rectangle (inclusive)
+        x1 = self.width - 1 if x1 is None else x1
+        y1 = self.height - 1 if y1 is None else y1
+        return self.value_index.query(x0, y0, x1, y1)
+
+    def to_arrays(self):
+        # read-only arrays of drones, asteroids, beacons, stations and radiation, plus a schema
+        return colony_arrays(self)
+
+    def memory_report(self, previous=None):
+        # estimated retained bytes per subsystem and agent type; pass the previous report's
+        # "snapshot" to get the top tracemalloc growth since then (when tracing is on)
+        return colony_memory_report(self, previous)
+
+    def create_scout(self):
+        i = len(self.scouts)
+        home = self.station_positions[i % len(self.station_positions)]
+        scout = ScoutDrone(self.next_id(), self, home, sensor_range=self.scout_sensor_range)
+        self.grid.place_agent(scout, home)
+        self.schedule.add(scout)
+        self.scouts.append(scout)
+
+        if i % 3 == 0:
+            scout.exploration_pattern = "spiral"
+        elif i % 3 == 1:
+            scout.exploration_pattern = "sector"
+        else:
+            scout.exploration_pattern = "quadrant"
+        return scout
+
+    def create_miner(self):
+        home = self.station_positions[len(self.miners) % len(self.station_positions)]
+        miner = MiningDrone(self.next_id(), self, home)
+        self.grid.place_agent(miner, home)
+        self.schedule.add(miner)
+        self.miners.append(miner)
+        return miner
 
+    def generate_solar_radiation(self):
+        storm, self.storm_due = self.storm_due, None
+        if storm is None:
+            storm = random.random() < self.radiation_probability
+        if storm:
             center_x = random.randrange(self.width)
             center_y = random.randrange(self.height)
             radius = random.randint(4, 8)
-
-            radiation.center = (center_x, center_y)
-            radiation.radius = radius
-
-            affected_area = []
-            for x in range(max(0, center_x - radius), min(self.width, center_x + radius + 1)):
-                for y in range(max(0, center_y - radius), min(self.height, center_y + radius + 1)):
-                    if ((x - center_x) ** 2 + (y - center_y) ** 2) <= radius ** 2:
-                        affected_area.append((x, y))
-
-            radiation.affected_area = affected_area
-            self.schedule.add(radiation)
-            self.active_radiations.append(radiation)
-
-    def step(self):
+            self.inject_radiation((center_x, center_y), radius)
+
+    def inject_radiation(self, center, radius, unique_id=None, **kwargs):
+        radiation = SolarRadiation(self.next_id() if unique_id is None else unique_id, self, **kwargs)
+        center_x, center_y = center
+
+        radiation.center = (center_x, center_y)
+        radiation.radius = radius
+
+        affected_area = []
+        for x in range(max(0, center_x - radius), min(self.width, center_x + radius + 1)):
+            for y in range(max(0, center_y - radius), min(self.height, center_y + radius + 1)):
+                if ((x - center_x) ** 2 + (y - center_y) ** 2) <= radius ** 2:
+                    affected_area.append((x, y))
+
+        radiation.affected_area = affected_area
+        self.schedule.add(radiation)
+        self.active_radiations.append(radiation)
+        return radiation
+
+    # shared-state writes made by drones go through these, so a two-phase step can
+    # record them while proposing and apply them in a fixed order at commit
+    def place_beacon(self, scout, asteroid):
+        beacon = Beacon(self.next_id(), self, asteroid.pos, asteroid.resource_type, asteroid.resource_value, asteroid)
+        self.grid.place_agent(beacon, asteroid.pos)
+        self.schedule.add(beacon)
+        self.active_beacons.append(beacon)
+        self.schedule.steps_stats["beacons_placed"] += 1
+
+        self.events.append(f"Scout {scout.unique_id} placed beacon for {asteroid.resource_type}")
+        return beacon
+
+    def draw_resources(self, beacon, amount):
+        beacon.value -= amount
+        if beacon.asteroid:
+            beacon.asteroid.resource_value = beacon.value
+        return beacon.value
+
+    def retire_beacon(self, beacon):
+        if beacon.asteroid:
+            beacon.asteroid.resource_value = 0
+            beacon.asteroid.is_depleted = True
+            self.events.append(f"Asteroid depleted: {beacon.resource_type}")
+
+        self.grid.remove_agent(beacon)
+        self.schedule.remove(beacon)
+        if beacon in self.active_beacons:
+            self.active_beacons.remove(beacon)
+
+        self.schedule.steps_stats["asteroids_depleted"] += 1
+        self.total_asteroids_depleted += 1
+
+    def receive_delivery(self, station, amount, resource_type):
+        station.receive_resources(amount, resource_type)
+        self.total_resources_collected += amount
+        self.schedule.steps_stats["resources_delivered"] += amount
+
+    def apply_overrides(self, overrides):
+        for key, value in overrides.items():
+            if key in ("num_scouts", "num_miners"):
+                fleet, create = (self.scouts, self.create_scout) if key == "num_scouts" else (self.miners, self.create_miner)
+                if value < len(fleet):
+                    raise ValueError(f"{key} can only grow in a running colony ({len(fleet)} -> {value})")
+                for _ in range(value - len(fleet)):
+                    create()
+                setattr(self, key, value)
+            elif key == "storm":
+                # True for a random storm, or a dict of inject_radiation arguments
+                storm = {} if value is True else dict(value)
+                center = storm.pop("center", (random.randrange(self.width), random.randrange(self.height)))
+                radius = storm.pop("radius", 8)
+                self.inject_radiation(tuple(center), radius, **storm)
+                self.events.append(f"Solar storm injected at {tuple(center)}")
+            elif key in ("radiation_probability", "resource_richness"):
+                setattr(self, key, value)
+            else:
+                raise ValueError(f"Unknown override: {key}")
+
+    def fork(self, n, overrides=None, horizon=100, report_every=10, seed=None):
+        # every branch is an os.fork() child that shares the warmed-up model copy-on-write,
+        # so nothing is serialized and the common prefix is never simulated again;
+        # children stream KPIs back as JSON lines and exit without touching the parent
+        if not hasattr(os, "fork"):
+            raise RuntimeError("fork() needs an OS with process forking")
+        # checked here, since a child that fails only shows up as a closed pipe
+        if n < 1:
+            raise ValueError(f"fork() needs at least one branch, got {n}")
+        if horizon < 0:
+            raise ValueError(f"horizon must not be negative, got {horizon}")
+        if report_every < 1:
+            raise ValueError(f"report_every must be at least 1, got {report_every}")
+
+        if overrides is None or isinstance(overrides, dict):
+            overrides = [overrides or {}] * n
+        if len(overrides) != n:
+            raise ValueError(f"Expected {n} override sets, got {len(overrides)}")
+        if seed is None:
+            seed = int.from_bytes(os.urandom(4), "little")
+
+        children = {}
+        for branch in range(n):
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                for other_fd in children:
+                    os.close(other_fd)
+                self._run_fork_branch(branch, overrides[branch], seed + branch, horizon, report_every, write_fd)
+            os.close(write_fd)
+            children[read_fd] = (pid, branch)
+
+        return self._collect_fork_reports(children)
+
+    def _run_fork_branch(self, branch, overrides, seed, horizon, report_every, write_fd):
+        status = 0
+        out = os.fdopen(write_fd, "w")
+        try:
+            random.seed(seed)
+            self.random.seed(seed)
+            self.apply_overrides(overrides)
+            start = self.step_counter
+            while self.step_counter - start < horizon:
+                taken = self.step_counter - start
+                self.step(min(horizon, taken + report_every - taken % report_every) - taken)
+                done = self.step_counter - start >= horizon
+                if done or (self.step_counter - start) % report_every == 0:
+                    report = dict(self.get_kpis(), branch=branch, overrides=overrides, done=done)
+                    out.write(json.dumps(report) + "\n")
+                    out.flush()
+        except BaseException as e:
+            status = 1
+            out.write(json.dumps({"branch": branch, "error": repr(e), "done": True}) + "\n")
+        finally:
+            out.close()
+            os._exit(status)
+
+    def _collect_fork_reports(self, children):
+        selector = selectors.DefaultSelector()
+        buffers = {}
+        for read_fd in children:
+            selector.register(read_fd, selectors.EVENT_READ)
+            buffers[read_fd] = b""
+
+        try:
+            while buffers:
+                for key, _ in selector.select():
+                    read_fd = key.fd
+                    chunk = os.read(read_fd, 65536)
+                    if not chunk:
+                        selector.unregister(read_fd)
+                        os.close(read_fd)
+                        del buffers[read_fd]
+                        os.waitpid(children.pop(read_fd)[0], 0)
+                        continue
+
+                    *lines, buffers[read_fd] = (buffers[read_fd] + chunk).split(b"\n")
+                    for line in lines:
+                        yield json.loads(line)
+        finally:
+            # the caller stopped listening early: don't leave branches running or unreaped
+            for read_fd, (pid, _) in children.items():
+                selector.unregister(read_fd)
+                os.close(read_fd)
+                os.kill(pid, signal.SIGTERM)
+                os.waitpid(pid, 0)
+            selector.close()
+
+    def step(self, max_steps=100):
+        # with fast_forward on, a quiet colony covers up to max_steps steps in one call
+        if self.fast_forward and self.fast_forward_quiet_steps(max_steps):
+            return
+        if self.field is not None:
+            self.field.update()
         self.generate_solar_radiation()
         self.schedule.step()
+        self.finish_step()
+
+    def steps_until(self, chance):
+        # how many steps pass before a per-step roll with this chance first comes up, in one draw
+        if chance <= 0:
+            return math.inf
+        if chance >= 1:
+            return 0
+        return int(math.log(1 - random.random()) / math.log(1 - chance))
+
+    def fast_forward_quiet_steps(self, max_steps):
+        # A stretch is quiet while no storm is out, no miner is after a beacon and no asteroid
+        # is about to be marked depleted: asteroids and beacons then have nothing to do but
+        # count down, so only drones and a busy station are stepped, in shuffled order since
+        # they still compete for cells and deliveries. Idle miners wandering with no beacon
+        # in reach are quiet; drones docked at a station follow a charge or repair curve
+        # predicted in one go. Instead of rolling every step, the jump draws when each drone
+        # next breaks down and when the next storm comes; the storm draw also settles the
+        # step after the jump. The jump ends early once a beacon is placed or picked.
+        if self.storm_due is not None or self.active_radiations or max_steps < 1:
+            return 0
+        if any(miner.target_beacon is not None for miner in self.miners):
+            return 0
+        horizon = max_steps
+        beacons = list(self.active_beacons)
+        for beacon in beacons:
+            value = beacon.asteroid.resource_value if beacon.asteroid else beacon.value
+            if value <= 0:
+                return 0
+            horizon = min(horizon, beacon.lifetime - 1)  # expiry is left to a normal step
+        if horizon < 1 or any(asteroid.resource_value <= 0 and not asteroid.is_depleted
+                              for asteroid in self.asteroids):
+            return 0
+
+        storm = self.steps_until(self.radiation_probability)
+        horizon = min(horizon, storm)
+        now = self.schedule.steps
+        drones = self.scouts + self.miners
+        docked = {}
+        for drone in drones:
+            drone.breakdown_step = now + self.steps_until(drone.malfunction_chance)
+            limit = horizon if drone.state == "malfunctioning" else min(horizon, drone.breakdown_step - now)
+            trajectory = drone.predict_quiet_steps(limit)
+            if trajectory:
+                docked[drone] = trajectory
+
+        # asteroid, beacon and station rows of the agent reporters don't change while quiet,
+        # so they are evaluated once; only the drone rows are re-evaluated every step
+        reporters = list(self.datacollector.agent_reporters.values())
+        agent_count = self.schedule.get_agent_count()
+        static_rows, drone_rows = [], []
+        for index, agent in enumerate(self.schedule.agents):
+            static_rows.append((agent.unique_id,) + tuple(rep(agent) for rep in reporters))
+            if agent.type in ("scout", "miner"):
+                drone_rows.append((index, agent))
+        depleted_count = self.count_depleted_asteroids()
 
+        taken = 0
+        while taken < horizon:
+            self.schedule.steps_stats = defaultdict(int)
+            movers = []
+            for drone in drones:
+                trajectory = docked.get(drone)
+                if trajectory and taken < len(trajectory):
+                    drone.apply_quiet_step(trajectory[taken])
+                else:
+                    movers.append(drone)
+            carrying = any(miner.capacity > 0 for miner in self.miners)
+            for station in self.stations:
+                if carrying or station.queue_length or any(station.lanes):
+                    movers.append(station)
+                else:
+                    station.processed_this_step = 0
+            self.random.shuffle(movers)
+            for agent in movers:
+                agent.step()
+            self.schedule.steps += 1
+            self.schedule.time += 1
+            taken += 1
+
+            # a placed beacon changes the agent list, so that step is collected in full
+            changed = self.schedule.get_agent_count() != agent_count
+            self.finish_step(None if changed else (static_rows, drone_rows), depleted_count)
+            if changed or any(miner.target_beacon is not None for miner in self.miners):
+                break
+
+        for beacon in beacons:
+            beacon.lifetime -= taken
+        for drone in drones:
+            drone.breakdown_step = None
+        self.storm_due = taken == storm
+        self.fast_forwarded_steps += taken
+        return taken
+
+    def collect_quiet(self, static_rows, drone_rows):
+        agent_reporters = self.datacollector.agent_reporters
+        self.datacollector.agent_reporters = {}
+        try:
+            self.datacollector.collect(self)
+        finally:
+            self.datacollector.agent_reporters = agent_reporters
+
+        rows = list(static_rows)
+        for index, drone in drone_rows:
+            rows[index] = (drone.unique_id,) + tuple(rep(drone) for rep in agent_reporters.values())
+
+        steps = self.schedule.steps
+        self.datacollector._agent_records[steps] = [(steps,) + row for row in rows]
+
+    def finish_step(self, quiet_rows=None, depleted_count=None):
         # operational cost (energy used)
         energy_cost = sum((scout.max_energy - scout.energy) for scout in self.scouts)
         energy_cost += sum((miner.max_energy - miner.energy) for miner in self.miners)
         self.operational_cost += energy_cost
 
-        self.datacollector.collect(self)
+        if quiet_rows is None:
+            self.datacollector.collect(self)
+        else:
+            self.collect_quiet(*quiet_rows)
 
         self.step_counter += 1
 
         if self.step_counter % 50 == 0:
             self.events.append(f"Step {self.step_counter}: {self.total_resources_collected} resources collected, value: {self.calculate_total_value()}")
 
-        depleted_count = self.count_depleted_asteroids()
+        if depleted_count is None:
+            depleted_count = self.count_depleted_asteroids()
         depleted_pct = (depleted_count / len(self.asteroids)) * 100 if len(self.asteroids) > 0 else 0
 
         if (int(depleted_pct) % 10 == 0 and
                 int(depleted_pct) > 0 and
                 int(depleted_pct / 10) > int(((depleted_count - 1) / len(self.asteroids) * 100) / 10)):
-            self.events.append(f"{depleted_pct:.1f}% of asteroids depleted ({depleted_count}/{len(self.asteroids)})")
\ No newline at end of file
+            self.events.append(f"{depleted_pct:.1f}% of asteroids depleted ({depleted_count}/{len(self.asteroids)})")
@@ -0,0 +1,422 @@
+from mesa import Agent
+
+from agents import ScoutDrone, MiningDrone, Beacon, Asteroid
+from model import AsteroidMiningColony
+
+from bisect import bisect_right
+from collections import defaultdict, deque
+import multiprocessing as mp
+import random
+
+# Domain-decomposed execution: the map is cut into tiles and every tile is stepped by its own
+# worker process. The coordinator generates the world once and ships each worker only the
+# asteroids and drones inside its tile, so a worker never holds the whole map. A worker owns
+# the agents inside its tile and keeps read-only ghosts of the drones and asteroids in a halo
+# band around it, plus every beacon in the colony (miners pick targets across the whole map).
+# Drones and freshly placed beacons that end a step outside their tile migrate to the owning
+# worker; radiation is rolled once by the coordinator and replicated to every worker. Colony
+# counters are reduced by the coordinator after each step.
+#
+# Results are statistically comparable with AsteroidMiningColony but not identical to a serial
+# run: each tile has its own RNG streams and miners only see the targeting of their own tile.
+
+AGENT_CLASSES = {"ScoutDrone": ScoutDrone, "MiningDrone": MiningDrone, "Beacon": Beacon, "Asteroid": Asteroid}
+REFERENCE_FIELDS = ("target_asteroid", "target_beacon", "asteroid")
+
+def export_agent(agent):
+    # a picklable record of an agent; references to other agents become their unique_ids
+    state = {}
+    for key, value in agent.__dict__.items():
+        if key == "model":
+            continue
+        if key in REFERENCE_FIELDS:
+            value = value.unique_id if value is not None else None
+        state[key] = value
+    return type(agent).__name__, state
+
+class Ghost(Agent):
+    # read-only stand-in for an agent owned by another tile; never scheduled
+    ghost = True
+
+    def __init__(self, unique_id, model, record):
+        super().__init__(unique_id, model)
+        self.asteroid = None
+        self.update(record)
+
+    def update(self, record):
+        for key, value in record.items():
+            if key != "pos":
+                setattr(self, key, value)
+
+    def step(self):
+        pass
+
+class TileColony(AsteroidMiningColony):
+    def __init__(self, tile_index, bounds, halo, id_stride, seed, params, agents, id_base, station_positions):
+        # an empty colony with the shared stations, filled with the records of the agents the
+        # coordinator generated inside this tile; the sparse grid keeps it from paying for the
+        # whole map
+        super().__init__(seed=seed, **{"space": "sparse", **params, "num_scouts": 0, "num_miners": 0,
+                                       "num_asteroids": 0, "station_placement": station_positions})
+        self.tile_index = tile_index
+        self.bounds = bounds  # x0, y0, x1, y1 with x1/y1 exclusive
+        self.halo = halo
+        self.id_base = self.current_id = id_base
+        self.id_count = 0
+        self.id_stride = id_stride
+        self.events = deque()
+        self.ghosts = {}
+        self.reported_totals = (0, 0)
+
+        # stations are few and numbered first, so every worker creates them all and keeps its own
+        for station in [station for station in self.stations if not self.owns(station.pos)]:
+            self.grid.remove_agent(station)
+            self.schedule.remove(station)
+            self.stations.remove(station)
+        for record in agents:
+            self.import_agent(record)
+
+        tile_seed = seed * 1000003 + tile_index
+        random.seed(tile_seed)
+        self.random.seed(tile_seed)
+
+    def next_id(self):
+        # ids created after the coordinator's build are strided per tile so they never collide
+        if not hasattr(self, "id_stride"):
+            return super().next_id()
+        self.id_count += 1
+        return self.id_base + self.id_count * self.id_stride + self.tile_index
+
+    def owns(self, pos):
+        x0, y0, x1, y1 = self.bounds
+        return x0 <= pos[0] < x1 and y0 <= pos[1] < y1
+
+    def in_halo_band(self, pos):
+        x0, y0, x1, y1 = self.bounds
+        return (pos[0] < x0 + self.halo or pos[0] >= x1 - self.halo or
+                pos[1] < y0 + self.halo or pos[1] >= y1 - self.halo)
+
+    def find_agent(self, unique_id):
+        return self.schedule._agents.get(unique_id) or self.ghosts.get(unique_id)
+
+    def step_tile(self, ghosts, beacons, radiations):
+        self.reconcile_ghosts(ghosts, beacons)
+        for unique_id, center, radius in radiations:
+            self.inject_radiation(center, radius, unique_id=unique_id)
+
+        self.schedule.step()
+        self.step_counter += 1
+
+        energy_cost = sum((scout.max_energy - scout.energy) for scout in self.scouts)
+        energy_cost += sum((miner.max_energy - miner.energy) for miner in self.miners)
+
+        emigrants = []
+        for agent in self.scouts + self.miners + self.active_beacons:
+            if not getattr(agent, "ghost", False) and not self.owns(agent.pos):
+                emigrants.append(export_agent(agent))
+                self.drop_agent(agent)
+
+        resources, depleted = self.reported_totals
+        self.reported_totals = (self.total_resources_collected, self.total_asteroids_depleted)
+        partials = {
+            "resources": self.total_resources_collected - resources,
+            "depleted": self.total_asteroids_depleted - depleted,
+            "energy_cost": energy_cost,
+            "steps_stats": dict(self.schedule.steps_stats),
+            "events": list(self.events),
+            "stations": {station.unique_id: dict(station.processed_resources) for station in self.stations},
+            "radiations": len(self.active_radiations)
+        }
+        self.events.clear()
+        return emigrants, partials
+
+    def sync(self, immigrants):
+        for record in immigrants:
+            self.import_agent(record)
+
+        halo_records = []
+        for agent in self.scouts + self.miners:
+            if self.in_halo_band(agent.pos):
+                halo_records.append({"unique_id": agent.unique_id, "pos": agent.pos, "type": agent.type})
+        for asteroid in self.asteroids:
+            if self.in_halo_band(asteroid.pos):
+                halo_records.append({"unique_id": asteroid.unique_id, "pos": asteroid.pos, "type": "asteroid",
+                                     "resource_type": asteroid.resource_type,
+                                     "resource_value": asteroid.resource_value,
+                                     "original_value": asteroid.original_value,
+                                     "is_depleted": asteroid.is_depleted})
+
+        beacon_records = [{"unique_id": beacon.unique_id, "pos": beacon.pos, "type": "beacon",
+                           "resource_type": beacon.resource_type, "value": beacon.value,
+                           "original_value": beacon.original_value, "lifetime": beacon.lifetime,
+                           "creation_time": beacon.creation_time}
+                          for beacon in self.active_beacons if not getattr(beacon, "ghost", False)]
+        return halo_records, beacon_records
+
+    def reconcile_ghosts(self, records, beacons):
+        seen = set()
+        for record in records + beacons:
+            unique_id = record["unique_id"]
+            if unique_id in self.schedule._agents:
+                continue
+            seen.add(unique_id)
+
+            ghost = self.ghosts.get(unique_id)
+            if ghost is None:
+                ghost = Ghost(unique_id, self, record)
+                self.ghosts[unique_id] = ghost
+                self.grid.place_agent(ghost, record["pos"])
+            else:
+                ghost.update(record)
+                if ghost.pos != record["pos"]:
+                    self.grid.move_agent(ghost, record["pos"])
+
+        for unique_id in [unique_id for unique_id in self.ghosts if unique_id not in seen]:
+            self.grid.remove_agent(self.ghosts.pop(unique_id))
+
+        self.active_beacons = [beacon for beacon in self.active_beacons if not getattr(beacon, "ghost", False)]
+        self.active_beacons += [ghost for ghost in self.ghosts.values() if ghost.type == "beacon"]
+
+        # drones may still point at objects that were replaced since (a beacon that moved
+        # into another tile right after being placed, a ghost that became owned)
+        for drone in self.scouts + self.miners:
+            for field in ("target_asteroid", "target_beacon"):
+                target = getattr(drone, field, None)
+                if target is not None and self.find_agent(target.unique_id) is not target:
+                    setattr(drone, field, self.find_agent(target.unique_id))
+
+        # a stuck miner can be nudged off its beacon mid-mining; across a tile border it has
+        # to walk back instead of mining another worker's beacon remotely
+        for miner in self.miners:
+            if miner.state == "mining" and getattr(miner.target_beacon, "ghost", False):
+                miner.state = "moving_to_beacon"
+
+    def import_agent(self, record):
+        class_name, state = record
+        agent = AGENT_CLASSES[class_name].__new__(AGENT_CLASSES[class_name])
+        agent.__dict__.update(state)
+        agent.model = self
+        for key in REFERENCE_FIELDS:
+            if key in state and state[key] is not None:
+                setattr(agent, key, self.find_agent(state[key]))
+
+        ghost = self.ghosts.pop(agent.unique_id, None)
+        if ghost is not None:
+            self.grid.remove_agent(ghost)
+            if ghost in self.active_beacons:
+                self.active_beacons.remove(ghost)
+
+        pos, agent.pos = agent.pos, None
+        if agent.type == "asteroid":
+            self.place_asteroid(agent, pos)
+            return
+        self.grid.place_agent(agent, pos)
+        self.schedule.add(agent)
+        if agent.type in ("scout", "miner"):
+            self.state_counts[agent.type][agent.state] += 1
+        if agent.type == "scout":
+            self.scouts.append(agent)
+        elif agent.type == "miner":
+            self.miners.append(agent)
+        elif agent.type == "beacon":
+            self.active_beacons.append(agent)
+
+    def drop_agent(self, agent):
+        if agent.type in ("scout", "miner"):
+            self.state_counts[agent.type][agent.state] -= 1
+        self.grid.remove_agent(agent)
+        self.schedule.remove(agent)
+        for agents in (self.scouts, self.miners, self.active_beacons):
+            if agent in agents:
+                agents.remove(agent)
+
+def run_tile_worker(conn, tile_index, bounds, halo, id_stride, seed, params):
+    agents, id_base, station_positions = conn.recv()
+    model = TileColony(tile_index, bounds, halo, id_stride, seed, params, agents, id_base, station_positions)
+    while True:
+        command, payload = conn.recv()
+        if command == "step":
+            conn.send(model.step_tile(*payload))
+        elif command == "sync":
+            conn.send(model.sync(payload))
+        elif command == "close":
+            conn.close()
+            return
+
+class PartitionedColony:
+    def __init__(self, tiles=(2, 2), seed=None, halo=None, **params):
+        if params.get("world", "static") != "static":
+            raise ValueError("Partitioned runs need a static world")
+        self.tiles_x, self.tiles_y = tiles
+        self.seed = seed if seed is not None else random.randrange(2 ** 31)
+        self.params = params
+        self.width = params.get("width", 50)
+        self.height = params.get("height", 50)
+        self.radiation_probability = params.get("radiation_probability", 0.01)
+        # ghosts must cover a scout's sensor range plus the cell a drone can step into
+        self.halo = halo if halo is not None else params.get("scout_sensor_range", 3) + 1
+
+        self.x_edges = [self.width * i // self.tiles_x for i in range(self.tiles_x + 1)]
+        self.y_edges = [self.height * i // self.tiles_y for i in range(self.tiles_y + 1)]
+        self.bounds = [(self.x_edges[i], self.y_edges[j], self.x_edges[i + 1], self.y_edges[j + 1])
+                       for j in range(self.tiles_y) for i in range(self.tiles_x)]
+        if any(x1 - x0 < 2 * self.halo or y1 - y0 < 2 * self.halo for x0, y0, x1, y1 in self.bounds):
+            raise ValueError("Tiles must be at least twice the halo width on each side")
+
+        num_tiles = len(self.bounds)
+        self.id_stride = num_tiles + 1  # the coordinator uses the last slot for radiation ids
+        self.next_radiation_id = 0
+
+        self.events = deque(maxlen=15)
+        self.step_counter = 0
+        self.total_resources_collected = 0
+        self.total_asteroids_depleted = 0
+        self.operational_cost = 0
+        self.migrations = 0
+        self.steps_stats = defaultdict(int)
+        self.station_resources = {}
+        self.history = defaultdict(list)
+        self.resource_values = {"iron": 1, "gold": 5, "platinum": 10, "water": 2, "helium": 20}
+
+        context = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else mp.get_context()
+        self.conns, self.workers = [], []
+        for tile_index, bounds in enumerate(self.bounds):
+            parent_conn, child_conn = context.Pipe()
+            worker = context.Process(target=run_tile_worker, daemon=True,
+                                     args=(child_conn, tile_index, bounds, self.halo, self.id_stride, self.seed, params))
+            worker.start()
+            self.conns.append(parent_conn)
+            self.workers.append(worker)
+
+        # workers are forked before the world exists, so none of them inherits a copy of it
+        layout = AsteroidMiningColony(seed=self.seed, **{"space": "sparse", **params})
+        shipments = [[] for _ in self.bounds]
+        for agent in layout.schedule.agents:
+            if agent.type != "station":
+                shipments[self.tile_of(agent.pos)].append(export_agent(agent))
+        for conn, agents in zip(self.conns, shipments):
+            conn.send((agents, layout.current_id, layout.station_positions))
+        del layout, shipments
+
+        random.seed(self.seed)
+        self.id_base = None
+        self.pending_ghosts = [[] for _ in self.bounds]
+        self.pending_beacons = []
+        self.exchange([[] for _ in self.bounds])
+
+    def tile_of(self, pos):
+        i = bisect_right(self.x_edges, pos[0]) - 1
+        j = bisect_right(self.y_edges, pos[1]) - 1
+        return j * self.tiles_x + i
+
+    def tiles_seeing(self, pos, owner):
+        # tiles whose halo reaches pos (at most three neighbours of the owner)
+        tiles = set()
+        for dx in (-self.halo, 0, self.halo):
+            for dy in (-self.halo, 0, self.halo):
+                x, y = pos[0] + dx, pos[1] + dy
+                if 0 <= x < self.width and 0 <= y < self.height:
+                    tiles.add(self.tile_of((x, y)))
+        tiles.discard(owner)
+        return tiles
+
+    def generate_radiations(self):
+        # same draws as AsteroidMiningColony.generate_solar_radiation, made once for all tiles
+        if random.random() < self.radiation_probability:
+            center = (random.randrange(self.width), random.randrange(self.height))
+            radius = random.randint(4, 8)
+            self.next_radiation_id += 1
+            unique_id = 10 ** 9 + self.next_radiation_id * self.id_stride + self.id_stride - 1
+            return [(unique_id, center, radius)]
+        return []
+
+    def exchange(self, immigrants):
+        for conn, records in zip(self.conns, immigrants):
+            conn.send(("sync", records))
+
+        self.pending_ghosts = [[] for _ in self.bounds]
+        self.pending_beacons = []
+        for tile_index, conn in enumerate(self.conns):
+            halo_records, beacon_records = conn.recv()
+            for record in halo_records:
+                for other in self.tiles_seeing(record["pos"], tile_index):
+                    self.pending_ghosts[other].append(record)
+            self.pending_beacons += beacon_records
+
+    def step(self):
+        radiations = self.generate_radiations()
+        for tile_index, conn in enumerate(self.conns):
+            conn.send(("step", (self.pending_ghosts[tile_index], self.pending_beacons, radiations)))
+        results = [conn.recv() for conn in self.conns]
+
+        immigrants = [[] for _ in self.bounds]
+        step_events = []
+        self.steps_stats = defaultdict(int)
+        energy_cost = 0
+        radiation_count = 0
+        for emigrants, partials in results:
+            for record in emigrants:
+                immigrants[self.tile_of(record[1]["pos"])].append(record)
+            self.migrations += len(emigrants)
+            self.total_resources_collected += partials["resources"]
+            self.total_asteroids_depleted += partials["depleted"]
+            energy_cost += partials["energy_cost"]
+            radiation_count = max(radiation_count, partials["radiations"])
+            for key, value in partials["steps_stats"].items():
+                self.steps_stats[key] += value
+            self.station_resources.update(partials["stations"])
+            step_events += partials["events"]
+
+        self.exchange(immigrants)
+
+        self.operational_cost += energy_cost
+        self.step_counter += 1
+        # radiation runs in every tile it covers, so its messages arrive once per tile
+        self.events.extend(dict.fromkeys(step_events))
+
+        kpis = self.get_kpis()
+        kpis["active_beacons"] = len(self.pending_beacons)
+        kpis["radiation_events"] = radiation_count
+        for key, value in kpis.items():
+            self.history[key].append(value)
+
+    def advance(self, steps):
+        for _ in range(steps):
+            self.step()
+
+    @property
+    def processed_resources(self):
+        totals = dict.fromkeys(self.resource_values, 0)
+        for processed in self.station_resources.values():
+            for resource_type, amount in processed.items():
+                totals[resource_type] += amount
+        return totals
+
+    def calculate_total_value(self):
+        return sum(amount * self.resource_values[r] for r, amount in self.processed_resources.items())
+
+    def get_kpis(self):
+        total_value = self.calculate_total_value()
+        return {
+            "step": self.step_counter,
+            "total_resources": self.total_resources_collected,
+            "total_value": total_value,
+            "operational_cost": self.operational_cost,
+            "asteroids_depleted": self.total_asteroids_depleted,
+            "efficiency": self.total_resources_collected / max(1, self.operational_cost),
+            "value_per_cost": total_value / max(1, self.operational_cost),
+            "migrations": self.migrations
+        }
+
+    def close(self):
+        for conn in self.conns:
+            conn.send(("close", None))
+        for worker in self.workers:
+            worker.join()
+        self.conns, self.workers = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
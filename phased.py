@@ -0,0 +1,164 @@
+from mesa.time import BaseScheduler
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+import os
+import random
+
+# Two-phase stepping. In the propose phase every drone runs its usual step against the colony
+# as it was when the step began: grid occupancy, beacons, beacon values and the other miners'
+# targets are frozen, and every write to shared state (moving, mining, delivering, placing a
+# beacon, events, step stats) is recorded instead of applied. Each drone draws from its own
+# generator, so proposals don't depend on each other and may run on a thread pool. The commit
+# phase then applies the proposals in unique_id order and settles conflicts:
+#   - a miner only enters a cell no other drone holds or has already entered this step
+#     (station and beacon cells are shared, as in the sequential model)
+#   - miners drawing down one beacon are served in unique_id order until it runs dry, and
+#     anything they were not granted comes back out of their hold
+#   - two scouts marking one asteroid in the same step place a single beacon
+# Stations, beacons, asteroids and radiation step after the commit, also in unique_id order.
+# A run is reproducible from the seed whatever the shuffle order or number of workers.
+
+class GridView:
+    def __init__(self, grid, proposal):
+        self.grid = grid
+        self.proposal = proposal
+
+    def __getattr__(self, name):
+        return getattr(self.grid, name)
+
+    def move_agent(self, agent, pos):
+        # the drone sees its own move straight away; the grid only changes at commit
+        self.proposal.move = pos
+        agent.pos = pos
+
+class Proposal:
+    def __init__(self, model, drone, miners, rng):
+        self.model = model
+        self.drone = drone
+        self.rng = rng
+        self.start_pos = drone.pos
+        self.grid = GridView(model.grid, self)
+        self.schedule = SimpleNamespace(steps=model.schedule.steps, steps_stats=defaultdict(int))
+        self.state_counts = {"scout": defaultdict(int), "miner": defaultdict(int)}
+        self.miners = miners
+        self.events = []
+        self.move = None
+        self.draws = []
+        self.deliveries = []
+        self.beacons = []
+
+    def __getattr__(self, name):
+        # everything a drone only reads comes from the model itself
+        return getattr(self.model, name)
+
+    def place_beacon(self, scout, asteroid):
+        self.beacons.append(asteroid)
+
+    def draw_resources(self, beacon, amount):
+        self.draws.append((beacon, amount))
+        return beacon.value - amount
+
+    def retire_beacon(self, beacon):
+        pass  # beacons drawn down to zero are retired once at commit
+
+    def receive_delivery(self, station, amount, resource_type):
+        self.deliveries.append((station, amount, resource_type))
+
+class PhasedActivation(BaseScheduler):
+    def __init__(self, model, workers=0):
+        super().__init__(model)
+        self.steps_stats = defaultdict(int)
+        self.workers = workers
+        self.pool = None
+        self.pool_pid = None
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["pool"] = state["pool_pid"] = None
+        return state
+
+    def step(self):
+        self.steps_stats = defaultdict(int)
+        agents = sorted(self._agents.values(), key=lambda agent: agent.unique_id)
+        drones = [agent for agent in agents if agent.type in ("scout", "miner")]
+
+        # one draw from the model stream seeds every drone's generator for this step
+        step_seed = self.model.random.getrandbits(64)
+        miners = [SimpleNamespace(unique_id=miner.unique_id, target_beacon=miner.target_beacon)
+                  for miner in self.model.miners]
+        proposals = [Proposal(self.model, drone, miners, random.Random(step_seed + drone.unique_id))
+                     for drone in drones]
+
+        if self.workers:
+            list(self.get_pool().map(self.propose, proposals))
+        else:
+            for proposal in proposals:
+                self.propose(proposal)
+
+        self.commit(proposals)
+
+        for agent in agents:
+            if agent.type not in ("scout", "miner") and agent.unique_id in self._agents:
+                agent.step()
+
+        self.steps += 1
+        self.time += 1
+
+    def get_pool(self):
+        # a forked branch inherits the executor object but not its threads
+        if self.pool is None or self.pool_pid != os.getpid():
+            self.pool = ThreadPoolExecutor(max_workers=self.workers)
+            self.pool_pid = os.getpid()
+        return self.pool
+
+    def propose(self, proposal):
+        drone = proposal.drone
+        drone.model, drone.rng = proposal, proposal.rng
+        try:
+            drone.step()
+        finally:
+            drone.model = proposal.model
+            drone.pos = proposal.start_pos
+            del drone.rng
+
+    def commit(self, proposals):
+        model = self.model
+        shared = set(model.station_positions) | {beacon.pos for beacon in model.active_beacons}
+        occupied = {proposal.start_pos for proposal in proposals if proposal.move is None}
+        drawn = []
+
+        for proposal in proposals:
+            drone = proposal.drone
+            model.events.extend(proposal.events)
+            for key, value in proposal.schedule.steps_stats.items():
+                self.steps_stats[key] += value
+            for kind, changes in proposal.state_counts.items():
+                for state, change in changes.items():
+                    model.state_counts[kind][state] += change
+
+            for beacon, amount in proposal.draws:
+                granted = max(0, min(amount, beacon.value))
+                drone.capacity -= amount - granted
+                self.steps_stats["resources_mined"] -= amount - granted
+                model.draw_resources(beacon, granted)
+                drawn.append(beacon)
+
+            for station, amount, resource_type in proposal.deliveries:
+                model.receive_delivery(station, amount, resource_type)
+
+            for asteroid in proposal.beacons:
+                cell_contents = model.grid.get_cell_list_contents([asteroid.pos])
+                if not any(agent.type == "beacon" for agent in cell_contents):
+                    model.place_beacon(drone, asteroid)
+
+            if proposal.move is not None:
+                if drone.type == "miner" and proposal.move not in shared and proposal.move in occupied:
+                    continue  # the cell went to a drone with a lower unique_id
+                model.grid.move_agent(drone, proposal.move)
+                occupied.add(proposal.move)
+
+        for beacon in dict.fromkeys(drawn):
+            if beacon.value <= 0 and beacon in model.active_beacons:
+                model.retire_beacon(beacon)
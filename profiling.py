@@ -0,0 +1,154 @@
+from mesa.datacollection import DataCollector
+
+from agents import ScoutDrone, MiningDrone, ProcessingStation, Asteroid, Beacon, SolarRadiation
+from model import AsteroidMiningColony, CustomActivation
+from phased import PhasedActivation
+
+import functools
+import threading
+import time
+from collections import defaultdict
+
+# the phases of a colony step and the per-agent methods that dominate them
+TARGETS = [
+    (AsteroidMiningColony, "step"),
+    (AsteroidMiningColony, "generate_solar_radiation"),
+    (AsteroidMiningColony, "finish_step"),
+    (CustomActivation, "step"),
+    (PhasedActivation, "step"),
+    (DataCollector, "collect"),
+    (ScoutDrone, "step"),
+    (ScoutDrone, "scan_for_asteroids"),
+    (ScoutDrone, "move_safely_towards"),
+    (MiningDrone, "step"),
+    (MiningDrone, "find_optimal_beacon"),
+    (MiningDrone, "move_safely_towards"),
+    (MiningDrone, "mine_resources"),
+    (ProcessingStation, "step"),
+    (Asteroid, "step"),
+    (Beacon, "step"),
+    (SolarRadiation, "step"),
+]
+
+class Histogram:
+    # call durations bucketed by powers of two nanoseconds; bucket b counts durations
+    # in [2 ** (b - 1), 2 ** b), so recording one is a bit_length and two additions
+    __slots__ = ("counts", "count", "total")
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.counts = [0] * 64
+        self.count = 0
+        self.total = 0
+
+    def add(self, ns):
+        self.counts[ns.bit_length()] += 1
+        self.count += 1
+        self.total += ns
+
+    def percentile(self, q):
+        # upper bound of the bucket holding the q-th percentile, in nanoseconds
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return 2 ** bucket
+        return 0
+
+class Profiler:
+    # Opt-in wall-clock timing of the methods in TARGETS. enable() replaces each method on its
+    # class with a timed wrapper and disable() puts the original back, so a run that never
+    # profiles executes the untouched methods. Every call goes into a Histogram per method, and
+    # its self time (minus the timed calls it made) into the collapsed call stack it ran under,
+    # which write_collapsed() exports for flame graph tools. Drones stepping on a two-phase
+    # pool each keep their own call stack.
+    def __init__(self, targets=TARGETS):
+        self.targets = targets
+        self.histograms = defaultdict(Histogram)
+        self.stacks = defaultdict(int)
+        self.local = threading.local()
+        self.originals = []
+
+    def enable(self):
+        if not self.originals:
+            for cls, name in self.targets:
+                original = cls.__dict__[name]
+                self.originals.append((cls, name, original))
+                setattr(cls, name, self.wrap(f"{cls.__name__}.{name}", original))
+        return self
+
+    def disable(self):
+        for cls, name, original in reversed(self.originals):
+            setattr(cls, name, original)
+        self.originals = []
+
+    def __enter__(self):
+        return self.enable()
+
+    def __exit__(self, *exc_info):
+        self.disable()
+
+    def reset(self):
+        # installed wrappers hold on to their histograms, so those are emptied in place
+        for histogram in self.histograms.values():
+            histogram.clear()
+        self.stacks.clear()
+
+    def wrap(self, label, method):
+        histogram = self.histograms[label]
+        stacks = self.stacks
+        local = self.local
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            frames = getattr(local, "frames", None)
+            if frames is None:
+                frames = local.frames = []
+            frame = [label, 0]  # label, time spent in timed calls below this one
+            frames.append(frame)
+            start = time.perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter_ns() - start
+                histogram.add(elapsed)
+                stacks[tuple(f[0] for f in frames)] += elapsed - frame[1]
+                frames.pop()
+                if frames:
+                    frames[-1][1] += elapsed
+        return timed
+
+    def summary(self):
+        # label -> calls, total and mean milliseconds, p50/p99 bucket bounds in microseconds
+        rows = {}
+        for label, histogram in self.histograms.items():
+            if histogram.count:
+                rows[label] = {
+                    "calls": histogram.count,
+                    "total_ms": histogram.total / 1e6,
+                    "mean_us": histogram.total / histogram.count / 1e3,
+                    "p50_us": histogram.percentile(50) / 1e3,
+                    "p99_us": histogram.percentile(99) / 1e3,
+                }
+        return rows
+
+    def print_summary(self):
+        rows = sorted(self.summary().items(), key=lambda item: -item[1]["total_ms"])
+        step = self.histograms["AsteroidMiningColony.step"].total / 1e6
+        print("\n--- Profile ---")
+        print(f"{'method':>46} {'calls':>9} {'total ms':>10} {'share':>6} {'mean us':>9} {'p50 us<':>9} {'p99 us<':>9}")
+        for label, row in rows:
+            share = row["total_ms"] / step if step else 0
+            print(f"{label:>46} {row['calls']:>9} {row['total_ms']:>10.1f} {share:>6.1%} "
+                  f"{row['mean_us']:>9.1f} {row['p50_us']:>9.1f} {row['p99_us']:>9.1f}")
+
+    def collapsed(self):
+        # "outer;inner;method microseconds" lines, the input format of flamegraph.pl and speedscope
+        return [f"{';'.join(stack)} {ns // 1000}" for stack, ns in sorted(self.stacks.items()) if ns >= 1000]
+
+    def write_collapsed(self, path):
+        with open(path, "w") as f:
+            f.write("\n".join(self.collapsed()) + "\n")
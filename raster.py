@@ -0,0 +1,135 @@
+import base64
+import math
+import os
+import struct
+import zlib
+
+import numpy as np
+from mesa.visualization.ModularVisualization import VisualizationElement
+
+# Raster views of a colony for maps too large to draw one shape per agent. Every layer is a
+# small image built from model.to_arrays(): cells are binned into square blocks so the image
+# never has more pixels than the canvas shows, and each image goes out as a palette PNG
+# shading from black to the layer color.
+
+LAYER_COLORS = {
+    "value": (255, 200, 40),      # remaining asteroid value
+    "drones": (60, 180, 255),     # scouts and miners per block
+    "radiation": (255, 40, 40),   # share of the block under solar radiation
+    "coverage": (40, 160, 60),    # share of the block the scouts have explored
+}
+
+def encode_png(pixels, palette):
+    # minimal 8-bit palette PNG: one IDAT chunk, no row filters, zlib does the work
+    height, width = pixels.shape
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    rows = np.zeros((height, width + 1), dtype=np.uint8)
+    rows[:, 1:] = pixels
+    header = struct.pack(">IIBBBBB", width, height, 8, 3, 0, 0, 0)
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"PLTE", palette.tobytes())
+            + chunk(b"IDAT", zlib.compress(rows.tobytes(), 6)) + chunk(b"IEND", b""))
+
+def ramp(color):
+    # 256 shades from black to the layer color
+    return (np.linspace(0, 1, 256)[:, None] * np.array(color)).round().astype(np.uint8)
+
+def block_factor(width, height, resolution):
+    # cells per block side so that the longer side fits in `resolution` pixels
+    return max(1, math.ceil(max(width, height) / resolution))
+
+def bin_cells(points, shape, factor, weights=None):
+    # sum of weights (or number of points) per block, indexed [bx, by]
+    blocks = np.zeros(shape[0] * shape[1], dtype=np.float64)
+    if len(points):
+        flat = (points[:, 0] // factor) * shape[1] + points[:, 1] // factor
+        blocks += np.bincount(flat, weights=weights, minlength=len(blocks))
+    return blocks.reshape(shape)
+
+def shades(intensity):
+    # [bx, by] intensities in 0..1 to palette indices with y pointing up, like the grid canvas
+    return np.ascontiguousarray((np.clip(intensity, 0, 1) * 255).round().astype(np.uint8).T[::-1])
+
+class RasterHeatmap(VisualizationElement):
+    # Sends one PNG per layer, and only when it differs from the one the browser already has.
+    # Drone, beacon and station positions ride along as plain lists so the browser can draw
+    # them once it is zoomed in far enough to tell cells apart (HeatmapModule.js).
+    # Value and drone density are scaled by the highest block seen so far in this model, so
+    # brightness stays comparable from frame to frame.
+    package_includes = []
+    local_includes = ["HeatmapModule.js"]
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+
+    def __init__(self, canvas_width=700, canvas_height=700, resolution=None, layers=tuple(LAYER_COLORS)):
+        self.canvas_width = canvas_width
+        self.canvas_height = canvas_height
+        self.resolution = resolution or max(canvas_width, canvas_height)
+        self.layers = list(layers)
+        self.model = None
+        self.js_code = f"elements.push(new HeatmapModule({canvas_width}, {canvas_height}, {self.layers}));"
+
+    def coverage_cells(self, model, arrays):
+        # scouts remember the cells they explored; a replay doesn't, so it collects scout
+        # positions from the frames it has rendered instead
+        visited = set()
+        for scout in model.scouts:
+            visited.update(getattr(scout, "visited_positions", ()))
+        if not visited:
+            self.trail.update(map(tuple, arrays["scout_pos"].tolist()))
+            visited = self.trail
+        return np.array(list(visited), dtype=np.int64).reshape(-1, 2)
+
+    def intensity(self, name, model, arrays, shape, factor):
+        if name == "radiation":
+            return bin_cells(arrays["hazard_cells"], shape, factor) / factor ** 2
+        if name == "coverage":
+            return bin_cells(self.coverage_cells(model, arrays), shape, factor) / factor ** 2
+        if name == "value":
+            live = ~arrays["asteroid_depleted"]
+            blocks = bin_cells(arrays["asteroid_pos"][live], shape, factor, arrays["asteroid_value"][live])
+        else:
+            blocks = bin_cells(np.concatenate([arrays["scout_pos"], arrays["miner_pos"]]), shape, factor)
+        self.peaks[name] = max(self.peaks.get(name, 0), blocks.max(initial=0))
+        return np.sqrt(blocks / self.peaks[name]) if self.peaks[name] else blocks
+
+    def render(self, model):
+        full = model is not self.model
+        if full:
+            self.model = model
+            self.sent = {}
+            self.uris = {}
+            self.peaks = {}
+            self.trail = set()
+        arrays, _ = model.to_arrays()
+        factor = block_factor(model.width, model.height, self.resolution)
+        shape = (math.ceil(model.width / factor), math.ceil(model.height / factor))
+
+        images = {}
+        for name in self.layers:
+            pixels = shades(self.intensity(name, model, arrays, shape, factor))
+            if name in self.sent and np.array_equal(self.sent[name], pixels):
+                continue
+            self.sent[name] = pixels
+            png = encode_png(pixels, ramp(LAYER_COLORS[name]))
+            images[name] = self.uris[name] = "data:image/png;base64," + base64.b64encode(png).decode("ascii")
+
+        self.frame = {
+            "full": full,
+            "width": model.width,
+            "height": model.height,
+            "factor": factor,
+            "images": images,
+            "scouts": np.column_stack([arrays["scout_pos"], arrays["scout_state"]]).tolist(),
+            "miners": np.column_stack([arrays["miner_pos"], arrays["miner_state"]]).tolist(),
+            "beacons": arrays["beacon_pos"].tolist(),
+            "stations": arrays["station_pos"].tolist(),
+        }
+        return self.frame
+
+    def keyframe(self, model):
+        # the last frame with every layer in it, for a client joining an ongoing stream
+        if model is not self.model:
+            return RasterHeatmap(self.canvas_width, self.canvas_height, self.resolution, self.layers).render(model)
+        return {**self.frame, "full": True, "images": dict(self.uris)}
@@ -0,0 +1,333 @@
+import json
+import os
+import struct
+
+import numpy as np
+from mesa import Model
+
+from snapshot import RESOURCE_TYPES, SCOUT_STATES, MINER_STATES, colony_arrays
+
+RECORDING_MAGIC = b"AMRC"
+RECORDING_VERSION = 1
+RADIATION_SLOTS = 16
+
+# magic, format version, flags (reserved), record size, layout length; the JSON layout follows,
+# padded to 8 bytes, then one fixed-width record per recorded step. A sidecar .idx file holds
+# the step number of every record so a replay can seek by step with a binary search.
+HEADER = struct.Struct("<4sHHII")
+
+def record_dtype(scouts, miners, asteroids, stations, charts):
+    return np.dtype([
+        ("step", "<i8"),
+        ("scout_pos", "<i4", (scouts, 2)), ("scout_energy", "<f8", (scouts,)), ("scout_state", "i1", (scouts,)),
+        ("miner_pos", "<i4", (miners, 2)), ("miner_energy", "<f8", (miners,)), ("miner_state", "i1", (miners,)),
+        ("miner_capacity", "<i4", (miners,)), ("miner_cargo", "i1", (miners,)),
+        ("asteroid_value", "<i4", (asteroids,)), ("asteroid_depleted", "?", (asteroids,)),
+        ("beacon_value", "<i4", (asteroids,)), ("beacon_original", "<i4", (asteroids,)),  # -1 without a beacon
+        ("radiation_center", "<i4", (RADIATION_SLOTS, 2)), ("radiation_radius", "<i2", (RADIATION_SLOTS,)),
+        ("radiation_state", "i1", (RADIATION_SLOTS,)),  # -1 unused, 0 warning, 1 active
+        ("station_queue", "<i4", (stations,)), ("station_busy", "<i2", (stations,)),
+        ("station_current", "<i4", (stations, 3)),  # resource code, amount, time left of the first lane
+        ("total_resources", "<i8"), ("operational_cost", "<f8"), ("asteroids_depleted", "<i8"),
+        ("processed", "<i8", (len(RESOURCE_TYPES),)), ("charts", "<f8", (charts,)),
+    ])
+
+class Recorder:
+    # Appends one fixed-width record per call to record(): drone positions, states and energies,
+    # asteroid values, beacons, radiation footprints, station lanes, colony counters and the
+    # latest value of every data collector column. Everything that never changes during a run
+    # (map size, ids, asteroid positions and types) goes into the layout in the header once.
+    def __init__(self, model, path):
+        if model.field is not None:
+            raise ValueError("Recording needs a static world; procedural worlds change their asteroids")
+
+        self.model = model
+        self.path = path
+        self.asteroid_index = {asteroid.unique_id: i for i, asteroid in enumerate(model.asteroids)}
+        self.charts = list(model.datacollector.model_vars)
+        self.dtype = record_dtype(len(model.scouts), len(model.miners), len(model.asteroids),
+                                  len(model.stations), len(self.charts))
+        self.layout = {
+            "width": model.width, "height": model.height,
+            "scout_ids": [scout.unique_id for scout in model.scouts],
+            "scout_max_energy": [scout.max_energy for scout in model.scouts],
+            "miner_ids": [miner.unique_id for miner in model.miners],
+            "miner_max_energy": [miner.max_energy for miner in model.miners],
+            "miner_max_capacity": [miner.max_capacity for miner in model.miners],
+            "asteroid_ids": [asteroid.unique_id for asteroid in model.asteroids],
+            "asteroid_pos": [list(asteroid.pos) for asteroid in model.asteroids],
+            "asteroid_type": [asteroid.resource_type for asteroid in model.asteroids],
+            "asteroid_original": [asteroid.original_value for asteroid in model.asteroids],
+            "station_ids": [station.unique_id for station in model.stations],
+            "station_pos": [list(pos) for pos in model.station_positions],
+            "station_lanes": len(model.station.lanes),
+            "resource_values": model.resource_values,
+            "charts": self.charts,
+            "dtype": self.dtype.descr,
+        }
+
+        layout = json.dumps(self.layout).encode()
+        layout += b" " * (-(HEADER.size + len(layout)) % 8)
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(RECORDING_MAGIC, RECORDING_VERSION, 0, self.dtype.itemsize, len(layout)))
+        self.file.write(layout)
+        self.index = open(f"{path}.idx", "wb")
+        self.records = 0
+
+    def record(self):
+        model = self.model
+        record = np.zeros((), dtype=self.dtype)
+        record["step"] = model.step_counter
+
+        scout_codes = {state: code for code, state in enumerate(SCOUT_STATES)}
+        miner_codes = {state: code for code, state in enumerate(MINER_STATES)}
+        resource_codes = {resource: code for code, resource in enumerate(RESOURCE_TYPES)}
+        for i, scout in enumerate(model.scouts):
+            record["scout_pos"][i] = scout.pos
+            record["scout_energy"][i] = scout.energy
+            record["scout_state"][i] = scout_codes[scout.state]
+        for i, miner in enumerate(model.miners):
+            record["miner_pos"][i] = miner.pos
+            record["miner_energy"][i] = miner.energy
+            record["miner_state"][i] = miner_codes[miner.state]
+            record["miner_capacity"][i] = miner.capacity
+            record["miner_cargo"][i] = resource_codes.get(miner.resource_type, -1)
+        for i, asteroid in enumerate(model.asteroids):
+            record["asteroid_value"][i] = asteroid.resource_value
+            record["asteroid_depleted"][i] = asteroid.is_depleted
+
+        record["beacon_value"] = -1
+        record["beacon_original"] = -1
+        for beacon in model.active_beacons:
+            i = self.asteroid_index[beacon.asteroid.unique_id]
+            record["beacon_value"][i] = beacon.value
+            record["beacon_original"][i] = beacon.original_value
+
+        # more simultaneous storms than slots is vanishingly rare; the extra ones aren't drawn
+        record["radiation_state"] = -1
+        for i, radiation in enumerate(model.active_radiations[:RADIATION_SLOTS]):
+            record["radiation_center"][i] = radiation.center
+            record["radiation_radius"][i] = radiation.radius
+            record["radiation_state"][i] = int(radiation.active)
+
+        for i, station in enumerate(model.stations):
+            record["station_queue"][i] = station.queue_length
+            record["station_busy"][i] = sum(1 for batch in station.lanes if batch)
+            current = station.currently_processing
+            record["station_current"][i] = (resource_codes[current[0]], current[1], current[2]) if current else (-1, 0, 0)
+
+        record["total_resources"] = model.total_resources_collected
+        record["operational_cost"] = model.operational_cost
+        record["asteroids_depleted"] = model.total_asteroids_depleted
+        record["processed"] = [model.processed_resources[r] for r in RESOURCE_TYPES]
+        record["charts"] = [(values[-1] if values else 0) for values in model.datacollector.model_vars.values()]
+
+        self.file.write(record.tobytes())
+        self.index.write(struct.pack("<q", model.step_counter))
+        self.records += 1
+
+    def flush(self):
+        self.file.flush()
+        self.index.flush()
+
+    def close(self):
+        self.file.close()
+        self.index.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def open_recording(path):
+    # returns the layout, a read-only memory map of the records and the step index
+    with open(path, "rb") as f:
+        header = f.read(HEADER.size)
+        if len(header) < HEADER.size:
+            raise ValueError("Recording is truncated")
+        magic, version, flags, record_size, layout_length = HEADER.unpack(header)
+        if magic != RECORDING_MAGIC:
+            raise ValueError("Not a colony recording")
+        if version != RECORDING_VERSION:
+            raise ValueError(f"Unsupported recording version {version} (expected {RECORDING_VERSION})")
+        layout = json.loads(f.read(layout_length))
+
+    dtype = np.dtype([(field[0], field[1], tuple(field[2])) if len(field) > 2 else tuple(field)
+                      for field in layout["dtype"]])
+    if dtype.itemsize != record_size:
+        raise ValueError("Recording layout doesn't match its record size")
+
+    # a recorder that is still running may have written part of a record; only whole ones count
+    offset = HEADER.size + layout_length
+    count = min((os.path.getsize(path) - offset) // record_size, os.path.getsize(f"{path}.idx") // 8)
+    records = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=(count,)) if count else np.zeros(0, dtype)
+    steps = np.memmap(f"{path}.idx", dtype="<i8", mode="r", shape=(count,)) if count else np.zeros(0, "<i8")
+    return layout, records, steps
+
+class ReplayAgent:
+    # stands in for a live agent: just the attributes agent_portrayal and the text elements read
+    def __init__(self, model, unique_id, agent_type, **attributes):
+        self.model = model
+        self.unique_id = unique_id
+        self.type = agent_type
+        self.__dict__.update(attributes)
+
+class ReplayGrid:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.torus = False
+        self.cells = {}
+
+    def place_agent(self, agent, pos):
+        self.cells.setdefault(pos, []).append(agent)
+        agent.pos = pos
+
+    def get_cell_list_contents(self, cell_list):
+        if isinstance(cell_list, tuple) and len(cell_list) == 2 and isinstance(cell_list[0], int):
+            cell_list = [cell_list]
+        return [agent for pos in cell_list for agent in self.cells.get(tuple(pos), ())]
+
+    def iter_cell_list_contents(self, cell_list):
+        return iter(self.get_cell_list_contents(cell_list))
+
+class ReplayDataCollector:
+    # model_vars[name] is a view of the recorded column up to the current record
+    def __init__(self, replay):
+        self.replay = replay
+
+    @property
+    def model_vars(self):
+        columns = self.replay.records["charts"][:self.replay.frame + 1]
+        return {name: columns[:, i] for i, name in enumerate(self.replay.charts)}
+
+class ReplayColony(Model):
+    # Plays a recording back through the same attributes the web interface reads from a live
+    # colony. The records are memory-mapped, so seeking anywhere costs one record read; step()
+    # moves one record forward, or backward with direction="backward".
+    def __init__(self, path, frame=0, direction="forward"):
+        super().__init__()
+        self.path = path
+        self.layout, self.records, self.steps = open_recording(path)
+        if not len(self.records):
+            raise ValueError(f"{path} holds no records")
+        self.direction = direction
+        self.width = self.layout["width"]
+        self.height = self.layout["height"]
+        self.charts = self.layout["charts"]
+        self.resource_values = self.layout["resource_values"]
+        self.space = "dense"
+        self.station_positions = [tuple(pos) for pos in self.layout["station_pos"]]
+        self.datacollector = ReplayDataCollector(self)
+        self.events = []
+        self.seek(frame)
+
+    @property
+    def frames(self):
+        return len(self.records)
+
+    def seek_step(self, step):
+        # the last record at or before the given simulation step
+        self.seek(max(0, int(np.searchsorted(self.steps, step, side="right")) - 1))
+
+    def step(self):
+        self.seek(self.frame + (-1 if self.direction == "backward" else 1))
+
+    def seek(self, frame):
+        self.frame = min(max(0, frame), self.frames - 1)
+        record = self.records[self.frame]
+        layout = self.layout
+        self.step_counter = int(record["step"])
+        self.running = self.frame < self.frames - 1 or self.direction == "backward"
+        self.total_resources_collected = int(record["total_resources"])
+        self.operational_cost = float(record["operational_cost"])
+        self.total_asteroids_depleted = int(record["asteroids_depleted"])
+        self.processed_resources = {r: int(amount) for r, amount in zip(RESOURCE_TYPES, record["processed"])}
+        self.events = [f"Replaying {os.path.basename(self.path)}: record {self.frame + 1}/{self.frames}, "
+                       f"step {self.step_counter}"]
+        self.grid = ReplayGrid(self.width, self.height)
+
+        self.stations = []
+        for i, (unique_id, pos) in enumerate(zip(layout["station_ids"], layout["station_pos"])):
+            code, amount, time = (int(v) for v in record["station_current"][i])
+            busy = int(record["station_busy"][i])
+            station = ReplayAgent(self, unique_id, "station", queue_length=int(record["station_queue"][i]),
+                                  lanes=[True] * busy + [None] * (layout["station_lanes"] - busy),
+                                  currently_processing=(RESOURCE_TYPES[code], amount, time) if code >= 0 else None)
+            self.grid.place_agent(station, tuple(pos))
+            self.stations.append(station)
+
+        self.asteroids = []
+        self.active_beacons = []
+        for i, unique_id in enumerate(layout["asteroid_ids"]):
+            pos = tuple(layout["asteroid_pos"][i])
+            asteroid = ReplayAgent(self, unique_id, "asteroid", resource_type=layout["asteroid_type"][i],
+                                   resource_value=int(record["asteroid_value"][i]),
+                                   original_value=layout["asteroid_original"][i],
+                                   is_depleted=bool(record["asteroid_depleted"][i]))
+            self.grid.place_agent(asteroid, pos)
+            self.asteroids.append(asteroid)
+            if record["beacon_value"][i] >= 0:
+                beacon = ReplayAgent(self, -unique_id, "beacon", resource_type=asteroid.resource_type,
+                                     value=int(record["beacon_value"][i]),
+                                     original_value=int(record["beacon_original"][i]), asteroid=asteroid)
+                self.grid.place_agent(beacon, pos)
+                self.active_beacons.append(beacon)
+
+        self.scouts = []
+        for i, unique_id in enumerate(layout["scout_ids"]):
+            scout = ReplayAgent(self, unique_id, "scout", state=SCOUT_STATES[record["scout_state"][i]],
+                                energy=float(record["scout_energy"][i]), max_energy=layout["scout_max_energy"][i])
+            self.grid.place_agent(scout, tuple(int(v) for v in record["scout_pos"][i]))
+            self.scouts.append(scout)
+
+        self.state_counts = {
+            "scout": dict(zip(SCOUT_STATES, np.bincount(record["scout_state"], minlength=len(SCOUT_STATES)).tolist())),
+            "miner": dict(zip(MINER_STATES, np.bincount(record["miner_state"], minlength=len(MINER_STATES)).tolist()))
+        }
+
+        self.miners = []
+        for i, unique_id in enumerate(layout["miner_ids"]):
+            cargo = record["miner_cargo"][i]
+            miner = ReplayAgent(self, unique_id, "miner", state=MINER_STATES[record["miner_state"][i]],
+                                energy=float(record["miner_energy"][i]), max_energy=layout["miner_max_energy"][i],
+                                capacity=int(record["miner_capacity"][i]),
+                                max_capacity=layout["miner_max_capacity"][i],
+                                resource_type=RESOURCE_TYPES[cargo] if cargo >= 0 else None)
+            self.grid.place_agent(miner, tuple(int(v) for v in record["miner_pos"][i]))
+            self.miners.append(miner)
+
+        # storms aren't placed on the grid in a live colony either; they are listed with their footprint
+        self.active_radiations = []
+        for slot in np.flatnonzero(record["radiation_state"] >= 0):
+            center = tuple(int(v) for v in record["radiation_center"][slot])
+            radius = int(record["radiation_radius"][slot])
+            self.active_radiations.append(ReplayAgent(self, None, "radiation", center=center, radius=radius,
+                                                      active=bool(record["radiation_state"][slot]),
+                                                      affected_area=self.footprint(center, radius)))
+
+    def to_arrays(self):
+        return colony_arrays(self)
+
+    def remaining_value(self, x0=0, y0=0, x1=None, y1=None):
+        # same totals as the live colony's region index, from the current record
+        x1 = self.width - 1 if x1 is None else x1
+        y1 = self.height - 1 if y1 is None else y1
+        record = self.records[self.frame]
+        pos = np.asarray(self.layout["asteroid_pos"], dtype=np.int64).reshape(-1, 2)
+        codes = np.array([RESOURCE_TYPES.index(r) for r in self.layout["asteroid_type"]], dtype=np.int64)
+        inside = ((pos[:, 0] >= x0) & (pos[:, 0] <= x1) & (pos[:, 1] >= y0) & (pos[:, 1] <= y1)
+                  & ~record["asteroid_depleted"])
+        values = np.bincount(codes[inside], weights=record["asteroid_value"][inside], minlength=len(RESOURCE_TYPES))
+        counts = np.bincount(codes[inside], minlength=len(RESOURCE_TYPES))
+        return {
+            "value": {r: int(values[i]) for i, r in enumerate(RESOURCE_TYPES)},
+            "count": {r: int(counts[i]) for i, r in enumerate(RESOURCE_TYPES)}
+        }
+
+    def footprint(self, center, radius):
+        cx, cy = center
+        return [(x, y) for x in range(max(0, cx - radius), min(self.width, cx + radius + 1))
+                for y in range(max(0, cy - radius), min(self.height, cy + radius + 1))
+                if (x - cx) ** 2 + (y - cy) ** 2 <= radius ** 2]
@@ -0,0 +1,75 @@
+RESOURCE_INDEX = {"iron": 0, "gold": 1, "platinum": 2, "water": 3, "helium": 4}
+
+class RegionIndex:
+    # Remaining asteroid value and undepleted asteroid counts per resource, kept in a sparse
+    # 2D Fenwick tree (a summed-area table that takes point updates) so any rectangle can be
+    # summed in O(log W * log H). Only tree nodes covering an undepleted asteroid are stored;
+    # a node that drops back to all zeros (its asteroids depleted, or evicted by a procedural
+    # world) is deleted, so the tree follows what is loaded rather than what was ever explored.
+    # Asteroids push their own changes (see Asteroid.resource_value / is_depleted).
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.tree = {}  # (i, j) -> [value per resource..., count per resource...]
+
+    def update(self, pos, resource_type, value, count):
+        r = RESOURCE_INDEX[resource_type]
+        i = pos[0] + 1
+        while i <= self.width:
+            j = pos[1] + 1
+            while j <= self.height:
+                node = self.tree.get((i, j))
+                if node is None:
+                    node = self.tree[(i, j)] = [0] * 10
+                node[r] += value
+                node[5 + r] += count
+                if (value < 0 or count < 0) and not any(node):
+                    del self.tree[(i, j)]
+                j += j & -j
+            i += i & -i
+
+    def add(self, asteroid):
+        if not asteroid.is_depleted:
+            self.update(asteroid.pos, asteroid.resource_type, asteroid.resource_value, 1)
+        asteroid.indexed = True
+
+    def remove(self, asteroid):
+        if not asteroid.is_depleted:
+            self.update(asteroid.pos, asteroid.resource_type, -asteroid.resource_value, -1)
+        asteroid.indexed = False
+
+    def prefix(self, x, y):
+        # sums over the cells [0, x] x [0, y]
+        totals = [0] * 10
+        i = min(x, self.width - 1) + 1
+        while i > 0:
+            j = min(y, self.height - 1) + 1
+            while j > 0:
+                node = self.tree.get((i, j))
+                if node is not None:
+                    for k in range(10):
+                        totals[k] += node[k]
+                j -= j & -j
+            i -= i & -i
+        return totals
+
+    def query(self, x0, y0, x1, y1):
+        # inclusive rectangle, clipped to the map
+        x0, y0 = max(0, x0), max(0, y0)
+        if x0 > x1 or y0 > y1:
+            totals = [0] * 10
+        else:
+            a = self.prefix(x1, y1)
+            b = self.prefix(x0 - 1, y1) if x0 > 0 else [0] * 10
+            c = self.prefix(x1, y0 - 1) if y0 > 0 else [0] * 10
+            d = self.prefix(x0 - 1, y0 - 1) if x0 > 0 and y0 > 0 else [0] * 10
+            totals = [a[k] - b[k] - c[k] + d[k] for k in range(10)]
+
+        return {
+            "value": {r: totals[i] for r, i in RESOURCE_INDEX.items()},
+            "count": {r: totals[5 + i] for r, i in RESOURCE_INDEX.items()}
+        }
+
+    def market_value(self, x0, y0, x1, y1, resource_values):
+        summary = self.query(x0, y0, x1, y1)
+        return sum(value * resource_values[r] for r, value in summary["value"].items())
@@ -0,0 +1,57 @@
+import math
+import numpy as np
+
+class StationLookup:
+    # Precomputed nearest-station (Voronoi) lookup under the chebyshev metric drones move in.
+    # The map is cut into blocks of block_size x block_size cells; a block that lies entirely
+    # inside one station's region stores that station, and the few blocks crossed by a region
+    # border keep a short candidate list that is resolved exactly per query.
+    def __init__(self, width, height, positions, max_blocks=256):
+        if not positions:
+            raise ValueError("At least one station position is required")
+
+        self.width = width
+        self.height = height
+        self.positions = list(positions)
+        self.block_size = max(1, math.ceil(max(width, height) / max_blocks))
+
+        bs = self.block_size
+        x0 = np.arange(0, width, bs)[:, None]
+        y0 = np.arange(0, height, bs)[None, :]
+        x1 = np.minimum(x0 + bs, width) - 1
+        y1 = np.minimum(y0 + bs, height) - 1
+
+        min_dist, max_dist = [], []
+        for px, py in self.positions:
+            dx_min = np.maximum(0, np.maximum(x0 - px, px - x1))
+            dy_min = np.maximum(0, np.maximum(y0 - py, py - y1))
+            dx_max = np.maximum(abs(x0 - px), abs(x1 - px))
+            dy_max = np.maximum(abs(y0 - py), abs(y1 - py))
+            min_dist.append(np.maximum(dx_min, dy_min))
+            max_dist.append(np.maximum(dx_max, dy_max))
+        min_dist = np.array(min_dist)
+        max_dist = np.array(max_dist)
+
+        # a station is a candidate for a block unless another station is closer to every cell in it
+        candidates = min_dist <= max_dist.min(axis=0)
+        counts = candidates.sum(axis=0)
+        self.owner = np.where(counts == 1, candidates.argmax(axis=0), -1).astype(np.int32)
+        self.candidates = {
+            (int(bx), int(by)): [int(i) for i in np.flatnonzero(candidates[:, bx, by])]
+            for bx, by in np.argwhere(counts > 1)
+        }
+
+    def nearest_index(self, pos):
+        x, y = pos
+        bx, by = x // self.block_size, y // self.block_size
+        owner = self.owner[bx, by]
+        if owner >= 0:
+            return int(owner)
+
+        # ties go to the lowest station index, matching home station order
+        return min(self.candidates[(bx, by)],
+                   key=lambda i: (max(abs(self.positions[i][0] - x), abs(self.positions[i][1] - y)), i))
+
+    def nearest(self, pos):
+        return self.positions[self.nearest_index(pos)]
+
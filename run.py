@@ -1,38 +1,171 @@
-from server import server
 import argparse
 
-def run_simulation(headless=False, steps=100):
-    if headless:
+def run_simulation(headless=False, steps=100, checkpoint_every=0, checkpoint_path="colony.ckpt", resume=None,
+                   fast_forward=False, tiles=None, record=None, replay=None, live=False,
+                   broadcast=False, profile=False, profile_output=None, memory_every=0, memory_trace=False,
+                   metrics_port=None):
+    # the colony in this process reports to a local Prometheus endpoint; tiles step in worker
+    # processes and are not covered
+    if metrics_port:
+        from telemetry import Telemetry
+
+        Telemetry().enable().serve(metrics_port)
+        print(f"Metrics at http://127.0.0.1:{metrics_port}/metrics")
+
+    if headless and tiles:
+        from partition import PartitionedColony
+
+        with PartitionedColony(tiles=tiles) as model:
+            for i in range(steps):
+                model.step()
+                if i % 10 == 0:
+                    print(f"Step {i}, Total Resources: {model.total_resources_collected}")
+
+            print("\n--- Simulation Results ---")
+            print(f"Tiles: {tiles[0]}x{tiles[1]}, Migrations: {model.migrations}")
+            print(f"Total Resources Collected: {model.total_resources_collected}")
+            print(f"Total Value: {model.calculate_total_value()}")
+            print(f"Asteroids Depleted: {model.total_asteroids_depleted}")
+            print(f"Operational Cost: {model.operational_cost}")
+            print(f"Efficiency: {model.total_resources_collected / max(1, model.operational_cost):.2f} resources/energy")
+    elif headless:
         from model import AsteroidMiningColony
-        model = AsteroidMiningColony()
+        from checkpoint import save_checkpoint, load_checkpoint
+        from recording import Recorder
+
+        # timed wrappers only exist while profiling, so a normal run steps the plain methods
+        profiler = None
+        if profile or profile_output:
+            from profiling import Profiler
+            profiler = Profiler().enable()
+
+        from memory import print_memory_report
+
+        if memory_trace:
+            import tracemalloc
+            tracemalloc.start()
+        snapshot = None
+
+        if resume:
+            model = load_checkpoint(resume)
+            print(f"Resumed from {resume} at step {model.step_counter}")
+        else:
+            model = AsteroidMiningColony()
+        if fast_forward and (model.step_mode != "sequential" or model.field is not None):
+            raise ValueError("--fast-forward needs a sequential colony with a static world")
+        model.fast_forward = fast_forward
+        # a recording needs every step, so it steps one at a time instead of fast-forwarding
+        recorder = Recorder(model, record) if record else None
+        if recorder:
+            recorder.record()
 
-        for i in range(steps):
-            model.step()
+        while model.step_counter < steps:
+            # step in chunks that end on every step we report or checkpoint at,
+            # so fast-forward jumps never skip over them
+            stop = model.step_counter + ((1 - model.step_counter) % 10 or 10)
+            if checkpoint_every:
+                stop = min(stop, model.step_counter + checkpoint_every - model.step_counter % checkpoint_every)
+            if memory_every:
+                stop = min(stop, model.step_counter + memory_every - model.step_counter % memory_every)
+            if recorder:
+                model.step(1)
+                recorder.record()
+            else:
+                while model.step_counter < min(stop, steps):
+                    model.step(min(stop, steps) - model.step_counter)
+
+            i = model.step_counter - 1
             if i % 10 == 0:
                 print(f"Step {i}, Total Resources: {model.total_resources_collected}")
+            if checkpoint_every and model.step_counter % checkpoint_every == 0:
+                size = save_checkpoint(model, checkpoint_path)
+                print(f"Checkpoint saved to {checkpoint_path} at step {model.step_counter} ({size} bytes)")
+            if memory_every and model.step_counter % memory_every == 0:
+                report = model.memory_report(snapshot)
+                snapshot = report.get("snapshot")
+                print_memory_report(report)
+
+        if recorder:
+            recorder.close()
+            print(f"Recorded {recorder.records} steps to {record}")
+        if profiler:
+            profiler.disable()
 
         print("\n--- Simulation Results ---")
         print(f"Total Resources Collected: {model.total_resources_collected}")
         print(f"Resource Breakdown:")
-        for resource, amount in model.station.processed_resources.items():
+        for resource, amount in model.processed_resources.items():
             if amount > 0:
                 value = amount * model.resource_values[resource]
                 print(f"  {resource.capitalize()}: {amount} units (Value: {value})")
 
-        total_value = sum(amount * model.resource_values[r] for r, amount in model.station.processed_resources.items())
+        total_value = sum(amount * model.resource_values[r] for r, amount in model.processed_resources.items())
         print(f"Total Value: {total_value}")
 
         print(f"Asteroids Depleted: {model.total_asteroids_depleted}")
         print(f"Operational Cost: {model.operational_cost}")
         print(f"Efficiency: {model.total_resources_collected / max(1, model.operational_cost):.2f} resources/energy")
+        if fast_forward:
+            print(f"Fast-forwarded Steps: {model.fast_forwarded_steps}")
+        if profiler:
+            profiler.print_summary()
+            if profile_output:
+                profiler.write_collapsed(profile_output)
+                print(f"Collapsed stacks written to {profile_output}")
+    elif replay:
+        from server import replay_server
+
+        viewer = replay_server(replay)
+        viewer.port = 8521
+        viewer.launch()
+    elif live or broadcast:
+        from server import broadcast_server, live_server
+
+        viewer = live_server() if live else broadcast_server()
+        viewer.port = 8521
+        viewer.launch()
     else:
+        # the web stack is only imported here, so headless runs start without building the server
+        from server import server
+
         server.port = 8521  
         server.launch()
 
-if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Run Asteroid Mining Colony Simulation")
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Run Asteroid Mining Colony Simulation")
     parser.add_argument("--headless", action="store_true", help="Run without visualization")
     parser.add_argument("--steps", type=int, default=100, help="Number of steps for headless simulation")
+    parser.add_argument("--checkpoint-every", type=int, default=0, help="Save a checkpoint every N steps (0 disables)")
+    parser.add_argument("--checkpoint-path", default="colony.ckpt", help="File the periodic checkpoint is written to")
+    parser.add_argument("--resume", default=None, help="Resume a headless run from a checkpoint file")
+    parser.add_argument("--fast-forward", action="store_true",
+                        help="Jump through quiet stretches, drawing only the events that end them")
+    parser.add_argument("--tiles", type=lambda value: tuple(int(n) for n in value.split("x")), default=None,
+                        help="Step a headless run in parallel on a grid of tiles, e.g. 2x2")
+    parser.add_argument("--record", default=None, help="Record every step of a headless run to this file")
+    parser.add_argument("--replay", default=None, help="Play a recording back in the web interface")
+    parser.add_argument("--live", action="store_true",
+                        help="Step the web interface's model on a background thread at full speed")
+    parser.add_argument("--broadcast", action="store_true",
+                        help="Serve one shared run to every browser; the first one to connect controls it")
+    parser.add_argument("--profile", action="store_true",
+                        help="Time the step phases and hot agent methods of a headless run and print a summary")
+    parser.add_argument("--profile-output", default=None,
+                        help="Write the profiled call stacks to this file in collapsed format, for flame graphs")
+    parser.add_argument("--memory-every", type=int, default=0,
+                        help="Print estimated memory by subsystem and agent type every N steps (0 disables)")
+    parser.add_argument("--memory-trace", action="store_true",
+                        help="Trace allocations so memory reports include the top growth since the last one")
+    parser.add_argument("--metrics-port", type=int, default=None,
+                        help="Serve Prometheus metrics of the running colony on this local port")
+    return parser
 
-    args = parser.parse_args()
-    run_simulation(args.headless, args.steps)
\ No newline at end of file
+def main(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+    run_simulation(args.headless, args.steps, args.checkpoint_every, args.checkpoint_path, args.resume,
+                   args.fast_forward, args.tiles, args.record, args.replay, args.live,
+                   args.broadcast, args.profile, args.profile_output,
+                   args.memory_every, args.memory_trace, args.metrics_port)
+
+if __name__ == "__main__":
+    main()
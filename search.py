@@ -0,0 +1,124 @@
+from model import AsteroidMiningColony
+
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+import argparse
+import itertools
+import math
+
+def build_candidates(scouts, miners, sensor_ranges, **fixed_params):
+    candidates = []
+    for num_scouts, num_miners, sensor_range in itertools.product(scouts, miners, sensor_ranges):
+        params = dict(fixed_params)
+        params.update(num_scouts=num_scouts, num_miners=num_miners, scout_sensor_range=sensor_range)
+        candidates.append(params)
+    return candidates
+
+def evaluate_candidate(params, horizon, seeds):
+    # short horizons end before most cargo reaches the station, so value still in
+    # the holds and the station queue counts too; seeds are averaged so a lucky
+    # asteroid layout doesn't win a round on its own
+    scores = []
+    for seed in seeds:
+        model = AsteroidMiningColony(seed=seed, **params)
+        for _ in range(horizon):
+            model.step()
+        kpis = model.get_kpis()
+        scores.append((kpis["total_value"] + kpis["cargo_value"]) / max(1, kpis["operational_cost"]))
+    return sum(scores) / len(scores)
+
+def successive_halving(candidates, min_horizon=50, max_horizon=800, eta=2, seeds=(0,), workers=None):
+    if eta < 2:
+        raise ValueError("eta must be at least 2")
+
+    survivors = list(range(len(candidates)))
+    horizon = min(min_horizon, max_horizon)
+    reached = {i: (0, 0.0) for i in survivors}  # candidate -> (rounds survived, last score)
+    trace = []
+    steps_simulated = 0
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        round_number = 0
+        while True:
+            round_number += 1
+            evaluate = partial(evaluate_candidate, horizon=horizon, seeds=seeds)
+            scores = list(pool.map(evaluate, [candidates[i] for i in survivors]))
+            steps_simulated += horizon * len(seeds) * len(survivors)
+
+            ranked = sorted(zip(survivors, scores), key=lambda item: item[1], reverse=True)
+            for i, score in ranked:
+                reached[i] = (round_number, score)
+
+            final_round = len(ranked) == 1 or horizon >= max_horizon
+            keep = len(ranked) if final_round else max(1, math.ceil(len(ranked) / eta))
+
+            trace.append({
+                "round": round_number,
+                "horizon": horizon,
+                "candidates": len(ranked),
+                "kept": keep,
+                "results": [{"params": candidates[i], "score": score} for i, score in ranked]
+            })
+
+            survivors = [i for i, _ in ranked[:keep]]
+            if final_round:
+                break
+            horizon = min(horizon * eta, max_horizon)
+
+    # candidates that lasted more rounds rank above ones eliminated earlier
+    order = sorted(reached, key=lambda i: reached[i], reverse=True)
+    leaderboard = [
+        {"rank": rank, "params": candidates[i], "rounds": reached[i][0], "score": reached[i][1]}
+        for rank, i in enumerate(order, start=1)
+    ]
+
+    return {
+        "leaderboard": leaderboard,
+        "trace": trace,
+        "steps_simulated": steps_simulated,
+        "steps_full": len(candidates) * max_horizon * len(seeds)
+    }
+
+def describe(params):
+    return (f"scouts={params['num_scouts']} miners={params['num_miners']} "
+            f"sensor={params['scout_sensor_range']}")
+
+def print_results(result, top=10):
+    print("--- Search Trace ---")
+    for entry in result["trace"]:
+        best = entry["results"][0]
+        print(f"Round {entry['round']}: {entry['candidates']} candidates x {entry['horizon']} steps, "
+              f"kept {entry['kept']}, best {describe(best['params'])} ({best['score']:.5f})")
+
+    print("\n--- Leaderboard ---")
+    for entry in result["leaderboard"][:top]:
+        print(f"{entry['rank']:>3}. {describe(entry['params'])}  "
+              f"score: {entry['score']:.5f}  rounds: {entry['rounds']}")
+
+    saved = 1 - result["steps_simulated"] / max(1, result["steps_full"])
+    print(f"\nSimulated {result['steps_simulated']} steps "
+          f"(full-length grid: {result['steps_full']}, saved {saved * 100:.1f}%)")
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Successive-halving search over fleet composition")
+    parser.add_argument("--scouts", type=int, nargs="+", default=[3, 5, 7], help="Candidate scout counts")
+    parser.add_argument("--miners", type=int, nargs="+", default=[5, 10, 15], help="Candidate miner counts")
+    parser.add_argument("--sensor-range", type=int, nargs="+", default=[2, 3, 4], help="Candidate scout sensor ranges")
+    parser.add_argument("--width", type=int, default=50, help="Map width")
+    parser.add_argument("--height", type=int, default=50, help="Map height")
+    parser.add_argument("--asteroids", type=int, default=80, help="Number of asteroids")
+    parser.add_argument("--min-horizon", type=int, default=50, help="Steps simulated in the first round")
+    parser.add_argument("--max-horizon", type=int, default=800, help="Steps simulated in the final round")
+    parser.add_argument("--eta", type=int, default=2, help="Horizon growth and elimination factor per round")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="Seeds averaged for every candidate")
+    parser.add_argument("--workers", type=int, default=None, help="Process pool size (default: CPU count)")
+    parser.add_argument("--top", type=int, default=10, help="Leaderboard entries to print")
+
+    args = parser.parse_args(argv)
+    candidates = build_candidates(args.scouts, args.miners, args.sensor_range,
+                                  width=args.width, height=args.height, num_asteroids=args.asteroids)
+    result = successive_halving(candidates, args.min_horizon, args.max_horizon, args.eta, args.seeds, args.workers)
+    print_results(result, args.top)
+
+if __name__ == "__main__":
+    main()
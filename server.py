@@ -1,8 +1,14 @@
 from mesa.visualization.ModularVisualization import ModularServer
-from mesa.visualization.modules import CanvasGrid, ChartModule, TextElement
+from mesa.visualization.modules import TextElement
 from mesa.visualization.UserParam import UserSettableParameter
 
+from broadcast import BroadcastServer, BroadcastStatus
+from canvas import DeltaCanvasGrid
+from charts import DownsampledChart, serve_chart_windows
+from live import LiveServer
 from model import AsteroidMiningColony
+from raster import RasterHeatmap
+from recording import ReplayColony, open_recording
 import numpy as np
 
 class ColonyInfoElement(TextElement):
@@ -15,17 +21,18 @@ class ColonyInfoElement(TextElement):
         operational_cost = model.operational_cost
         efficiency = total_resources / max(1, operational_cost)
 
-        resources = model.station.processed_resources
+        resources = model.processed_resources
 
         resource_values = model.resource_values
 
         total_value = sum(resources[r] * resource_values[r] for r in resources.keys())
 
-        scout_states = {state: sum(1 for s in model.scouts if s.state == state) for state in ["exploring", "analyzing", "returning", "recharging", "malfunctioning"]}
-        miner_states = {state: sum(1 for m in model.miners if m.state == state) for state in ["idle", "moving_to_beacon", "mining", "returning", "recharging", "malfunctioning"]}
+        scout_states = model.state_counts["scout"]
+        miner_states = model.state_counts["miner"]
 
+        # the region index already counts the asteroids that still hold resources
         total_asteroids = len(model.asteroids)
-        depleted_asteroids = sum(1 for asteroid in model.asteroids if asteroid.is_depleted)
+        depleted_asteroids = total_asteroids - sum(model.remaining_value()["count"].values())
 
         info = f"<h3>Colony Stats (Step {model.step_counter})</h3>"
         info += f"<b>Resource Collection:</b> {total_resources} units <br>"
@@ -204,7 +211,13 @@ def agent_portrayal(agent):
             portrayal["text_color"] = "#000000"
 
             # Add processing indicator
-            if agent.currently_processing:
+            if len(agent.lanes) > 1:
+                busy = sum(1 for batch in agent.lanes if batch)
+                if busy:
+                    portrayal["text"] = f"BASE [{busy}/{len(agent.lanes)} lanes, queue {agent.queue_length}]"
+                    portrayal["strokeColor"] = "#00ff00"
+                    portrayal["strokeWidth"] = 2
+            elif agent.currently_processing:
                 resource_type, amount, time = agent.currently_processing
                 portrayal["text"] = f"BASE [{resource_type}: {time}]"
                 portrayal["strokeColor"] = "#00ff00"
@@ -305,48 +318,107 @@ def agent_portrayal(agent):
 
     return portrayal
 
-canvas_element = CanvasGrid(agent_portrayal, 50, 50, 700, 700)
+model_params = {
+    "width": 50,
+    "height": 50,
+    "num_scouts": UserSettableParameter("slider", "Number of Scout Drones", 5, 1, 15, 1),
+    "num_miners": UserSettableParameter("slider", "Number of Mining Drones", 10, 1, 25, 1),
+    "num_asteroids": UserSettableParameter("slider", "Number of Asteroids", 80, 20, 200, 10),
+    "radiation_probability": UserSettableParameter("slider", "Radiation Probability", 0.01, 0, 0.1, 0.01),
+    "resource_richness": UserSettableParameter("slider", "Resource Richness", 1.0, 0.5, 3.0, 0.1),
+    "scout_sensor_range": UserSettableParameter("slider", "Scout Sensor Range", 3, 1, 6, 1)
+}
+
+def map_elements(width, height):
+    # one shape per agent stops being readable (and affordable) past a hundred cells a side
+    if max(width, height) <= 100:
+        return [DeltaCanvasGrid(agent_portrayal, width, height, 700, 700), RasterHeatmap(700, 700)]
+    return [RasterHeatmap(700, 700)]
 
 info_element = ColonyInfoElement()
 event_log_element = EventLogElement()
 legend_element = LegendElement()
 
-resource_chart = ChartModule([
+resource_series = [
     {"Label": "Total Resources", "Color": "black"},
     {"Label": "Iron Collected", "Color": "#A52A2A"},
     {"Label": "Gold Collected", "Color": "#FFD700"},
     {"Label": "Platinum Collected", "Color": "#E5E4E2"},
     {"Label": "Water Collected", "Color": "#1E90FF"},
     {"Label": "Helium Collected", "Color": "#ADD8E6"}
-], data_collector_name='datacollector')
+]
 
-activity_chart = ChartModule([
+activity_series = [
     {"Label": "Active Beacons", "Color": "#FFFF00"},
     {"Label": "Radiation Events", "Color": "#FF0000"},
     {"Label": "Asteroids Depleted", "Color": "#D3D3D3"}
-], data_collector_name='datacollector')
+]
 
-efficiency_chart = ChartModule([
+efficiency_series = [
     {"Label": "Scout Energy", "Color": "#4363d8"},
     {"Label": "Miner Energy", "Color": "#3cb44b"},
     {"Label": "Mining Efficiency", "Color": "#f58231"},
     {"Label": "Total Value", "Color": "#e6194B"}
-], data_collector_name='datacollector')
-
-model_params = {
-    "width": 50,
-    "height": 50,
-    "num_scouts": UserSettableParameter("slider", "Number of Scout Drones", 5, 1, 15, 1),
-    "num_miners": UserSettableParameter("slider", "Number of Mining Drones", 10, 1, 25, 1),
-    "num_asteroids": UserSettableParameter("slider", "Number of Asteroids", 80, 20, 200, 10),
-    "radiation_probability": UserSettableParameter("slider", "Radiation Probability", 0.01, 0, 0.1, 0.01),
-    "resource_richness": UserSettableParameter("slider", "Resource Richness", 1.0, 0.5, 3.0, 0.1),
-    "scout_sensor_range": UserSettableParameter("slider", "Scout Sensor Range", 3, 1, 6, 1)
-}
-
-server = ModularServer(
+]
+
+# miners per state, in the colors the grid draws them with
+fleet_series = [
+    {"Label": "Miners Idle", "Color": "#4363d8"},
+    {"Label": "Miners Moving To Beacon", "Color": "#800080"},
+    {"Label": "Miners Mining", "Color": "#e6194B"},
+    {"Label": "Miners Returning", "Color": "#3cb44b"},
+    {"Label": "Miners Recharging", "Color": "#42d4f4"},
+    {"Label": "Miners Malfunctioning", "Color": "#f58231"}
+]
+
+def chart_elements():
+    # each server gets its own charts, they keep a summary of the series they have plotted
+    return [DownsampledChart(resource_series), DownsampledChart(activity_series), DownsampledChart(efficiency_series),
+            DownsampledChart(fleet_series)]
+
+server = serve_chart_windows(ModularServer(
     AsteroidMiningColony,
-    [canvas_element, info_element, legend_element, event_log_element, resource_chart, activity_chart, efficiency_chart],
+    [*map_elements(model_params["width"], model_params["height"]), info_element, legend_element, event_log_element,
+     *chart_elements()],
     "Enhanced Asteroid Mining Colony",
     model_params
-)
\ No newline at end of file
+))
+
+def replay_server(path):
+    # the same page driven by a recording; reset jumps to the chosen record, step plays it either way
+    layout, records, _ = open_recording(path)
+    frames = len(records)
+    replay_params = {
+        "path": path,
+        "frame": UserSettableParameter("slider", "Start at record", 0, 0, max(0, frames - 1), 1),
+        "direction": UserSettableParameter("choice", "Play direction", value="forward", choices=["forward", "backward"])
+    }
+    return serve_chart_windows(ModularServer(
+        ReplayColony,
+        [*map_elements(layout["width"], layout["height"]), info_element, legend_element, event_log_element,
+         *chart_elements()],
+        f"Asteroid Mining Colony Replay ({path})",
+        replay_params
+    ))
+
+def live_server(idle_timeout=2.0):
+    # the colony steps on a background thread at full speed; the page samples the latest
+    # completed step at its own frame rate and the charts still trace every collected row
+    return serve_chart_windows(LiveServer(
+        AsteroidMiningColony,
+        [*map_elements(model_params["width"], model_params["height"]), info_element, legend_element, event_log_element,
+         *chart_elements()],
+        "Enhanced Asteroid Mining Colony (live)",
+        model_params,
+        idle_timeout=idle_timeout
+    ))
+
+def broadcast_server():
+    # one shared colony for every browser; the first page to connect controls it, the rest watch
+    return serve_chart_windows(BroadcastServer(
+        AsteroidMiningColony,
+        [BroadcastStatus(), *map_elements(model_params["width"], model_params["height"]), info_element, legend_element,
+         event_log_element, *chart_elements()],
+        "Enhanced Asteroid Mining Colony (shared)",
+        model_params
+    ))
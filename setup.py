@@ -3,6 +3,11 @@ from setuptools import setup
 setup(
     name="asteroid_mining",
     version="0.1.0",
-    packages=["asteroid_mining"],
+    # flat modules; the web interface reads its JavaScript from the directory server.py is in,
+    # so `serve` needs an editable install (pip install -e .) or a checkout
+    py_modules=["agents", "bench", "broadcast", "canvas", "charts", "checkpoint", "cli", "ensemble", "live",
+                "memory", "model", "partition", "phased", "profiling", "raster", "recording", "regions",
+                "routing", "run", "search", "server", "snapshot", "space", "telemetry", "world"],
     install_requires=["mesa==1.2.1", "numpy", "matplotlib"],
-)
\ No newline at end of file
+    entry_points={"console_scripts": ["asteroid-mining=cli:main"]},
+)
@@ -0,0 +1,93 @@
+import numpy as np
+
+# Flat array snapshots of a colony for analysis and rendering. A snapshot is a dict of
+# read-only NumPy arrays, one row per drone, asteroid, beacon or station, plus a schema
+# describing each array (dtype, shape, meaning and, for coded columns, the code table).
+# AsteroidMiningColony.to_arrays() builds compact copies in a single pass over its agent
+# lists; Ensemble.to_arrays() hands out views of its own arrays without copying.
+
+RESOURCE_TYPES = ["iron", "gold", "platinum", "water", "helium"]
+SCOUT_STATES = ["exploring", "analyzing", "returning", "recharging", "malfunctioning"]
+MINER_STATES = ["idle", "moving_to_beacon", "mining", "returning", "recharging", "malfunctioning"]
+
+FIELDS = {
+    "scout_id": ("unique_id of each scout", None),
+    "scout_pos": ("grid cell (x, y) of each scout", None),
+    "scout_energy": ("remaining energy of each scout", None),
+    "scout_state": ("state code of each scout", SCOUT_STATES),
+    "miner_id": ("unique_id of each miner", None),
+    "miner_pos": ("grid cell (x, y) of each miner", None),
+    "miner_energy": ("remaining energy of each miner", None),
+    "miner_state": ("state code of each miner", MINER_STATES),
+    "miner_capacity": ("units of cargo each miner carries", None),
+    "miner_cargo": ("resource code of the cargo, -1 for none", RESOURCE_TYPES),
+    "asteroid_id": ("unique_id of each asteroid", None),
+    "asteroid_pos": ("grid cell (x, y) of each asteroid", None),
+    "asteroid_type": ("resource code of each asteroid", RESOURCE_TYPES),
+    "asteroid_value": ("remaining resource value of each asteroid", None),
+    "asteroid_depleted": ("whether each asteroid is depleted", None),
+    "beacon_pos": ("grid cell (x, y) of each active beacon", None),
+    "beacon_type": ("resource code of each active beacon", RESOURCE_TYPES),
+    "beacon_value": ("value each active beacon advertises", None),
+    "station_pos": ("grid cell (x, y) of each station", None),
+    "hazard": ("cells covered by solar radiation, warning or active, indexed [x, y]", None),
+    "hazard_cells": ("cells covered by solar radiation as (x, y) rows", None),
+}
+
+def frozen(array):
+    array.flags.writeable = False
+    return array
+
+def snapshot(arrays):
+    # freeze every array and describe it; the schema only holds plain Python values
+    schema = {}
+    for name, array in arrays.items():
+        description, codes = FIELDS[name]
+        schema[name] = {"dtype": str(array.dtype), "shape": array.shape, "description": description}
+        if codes is not None:
+            schema[name]["codes"] = list(codes)
+    return {name: frozen(array) for name, array in arrays.items()}, schema
+
+def cells(points):
+    return np.array(points, dtype=np.int64).reshape(-1, 2)
+
+def hazard_mask(width, height, hazard_cells):
+    mask = np.zeros((width, height), dtype=bool)
+    mask[hazard_cells[:, 0], hazard_cells[:, 1]] = True
+    return mask
+
+def colony_arrays(model):
+    scout_codes = {state: code for code, state in enumerate(SCOUT_STATES)}
+    miner_codes = {state: code for code, state in enumerate(MINER_STATES)}
+    resource_codes = {resource: code for code, resource in enumerate(RESOURCE_TYPES)}
+    scouts, miners, asteroids, beacons = model.scouts, model.miners, model.asteroids, model.active_beacons
+
+    hazard_cells = cells([pos for radiation in model.active_radiations for pos in radiation.affected_area])
+    hazard_cells = np.unique(hazard_cells, axis=0) if len(hazard_cells) else hazard_cells
+
+    arrays = {
+        "scout_id": np.array([scout.unique_id for scout in scouts], dtype=np.int64),
+        "scout_pos": cells([scout.pos for scout in scouts]),
+        "scout_energy": np.array([scout.energy for scout in scouts], dtype=np.float64),
+        "scout_state": np.array([scout_codes[scout.state] for scout in scouts], dtype=np.int8),
+        "miner_id": np.array([miner.unique_id for miner in miners], dtype=np.int64),
+        "miner_pos": cells([miner.pos for miner in miners]),
+        "miner_energy": np.array([miner.energy for miner in miners], dtype=np.float64),
+        "miner_state": np.array([miner_codes[miner.state] for miner in miners], dtype=np.int8),
+        "miner_capacity": np.array([miner.capacity for miner in miners], dtype=np.int64),
+        "miner_cargo": np.array([resource_codes.get(miner.resource_type, -1) for miner in miners], dtype=np.int64),
+        "asteroid_id": np.array([asteroid.unique_id for asteroid in asteroids], dtype=np.int64),
+        "asteroid_pos": cells([asteroid.pos for asteroid in asteroids]),
+        "asteroid_type": np.array([resource_codes[asteroid.resource_type] for asteroid in asteroids], dtype=np.int64),
+        "asteroid_value": np.array([asteroid.resource_value for asteroid in asteroids], dtype=np.int64),
+        "asteroid_depleted": np.array([asteroid.is_depleted for asteroid in asteroids], dtype=bool),
+        "beacon_pos": cells([beacon.pos for beacon in beacons]),
+        "beacon_type": np.array([resource_codes[beacon.resource_type] for beacon in beacons], dtype=np.int64),
+        "beacon_value": np.array([beacon.value for beacon in beacons], dtype=np.int64),
+        "station_pos": cells(model.station_positions),
+        "hazard_cells": hazard_cells,
+    }
+    # a full mask only makes sense on a dense map; sparse maps can be astronomically large
+    if model.space == "dense":
+        arrays["hazard"] = hazard_mask(model.width, model.height, hazard_cells)
+    return snapshot(arrays)
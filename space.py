@@ -0,0 +1,109 @@
+import itertools
+
+class SparseMultiGrid:
+    # Drop-in replacement for mesa's MultiGrid (non-toroidal) that only stores occupied cells.
+    # Cells live in a hash of chunks: chunk (cx, cy) maps (x, y) -> list of agents for the
+    # cells of one chunk_size x chunk_size block, and a chunk is dropped again once its last
+    # agent leaves. width/height may be None for an unbounded axis.
+    #
+    # Queries return agents and coordinates in the same order as MultiGrid (x-major, then y,
+    # then placement order within a cell), so a colony behaves identically on either backend.
+    def __init__(self, width, height, chunk_size=16):
+        self.width = width
+        self.height = height
+        self.torus = False
+        self.chunk_size = chunk_size
+        self.chunks = {}
+
+    def out_of_bounds(self, pos):
+        x, y = pos
+        return ((self.width is not None and not 0 <= x < self.width) or
+                (self.height is not None and not 0 <= y < self.height))
+
+    def chunk_key(self, pos):
+        return pos[0] // self.chunk_size, pos[1] // self.chunk_size
+
+    def place_agent(self, agent, pos):
+        if self.out_of_bounds(pos):
+            raise Exception("Point out of bounds, and space non-toroidal.")
+
+        cells = self.chunks.setdefault(self.chunk_key(pos), {})
+        cell = cells.setdefault(pos, [])
+        if agent.pos is None or agent not in cell:
+            cell.append(agent)
+            agent.pos = pos
+
+    def remove_agent(self, agent):
+        pos = agent.pos
+        key = self.chunk_key(pos)
+        cells = self.chunks[key]
+        cell = cells[pos]
+        cell.remove(agent)
+        if not cell:
+            del cells[pos]
+            if not cells:
+                del self.chunks[key]
+        agent.pos = None
+
+    def move_agent(self, agent, pos):
+        if self.out_of_bounds(pos):
+            raise Exception("Point out of bounds, and space non-toroidal.")
+        self.remove_agent(agent)
+        self.place_agent(agent, pos)
+
+    def is_cell_empty(self, pos):
+        cells = self.chunks.get(self.chunk_key(pos))
+        return cells is None or pos not in cells
+
+    def iter_cell_list_contents(self, cell_list):
+        if isinstance(cell_list, tuple) and len(cell_list) == 2 and isinstance(cell_list[0], int):
+            cell_list = [cell_list]
+
+        chunks, size = self.chunks, self.chunk_size
+        for x, y in cell_list:
+            cells = chunks.get((x // size, y // size))
+            if cells is not None:
+                yield from cells.get((x, y), ())
+
+    def get_cell_list_contents(self, cell_list):
+        return list(self.iter_cell_list_contents(cell_list))
+
+    def clip(self, x, y, radius):
+        x0, x1, y0, y1 = x - radius, x + radius, y - radius, y + radius
+        if self.width is not None:
+            x0, x1 = max(0, x0), min(self.width - 1, x1)
+        if self.height is not None:
+            y0, y1 = max(0, y0), min(self.height - 1, y1)
+        return x0, x1, y0, y1
+
+    def get_neighborhood(self, pos, moore, include_center=False, radius=1):
+        x, y = pos
+        x0, x1, y0, y1 = self.clip(x, y, radius)
+        return [(nx, ny) for nx in range(x0, x1 + 1) for ny in range(y0, y1 + 1)
+                if (moore or abs(nx - x) + abs(ny - y) <= radius) and (include_center or (nx, ny) != pos)]
+
+    def iter_neighbors(self, pos, moore, include_center=False, radius=1):
+        # walk the occupied cells of the chunks overlapping the box instead of every cell in it
+        x, y = pos
+        x0, x1, y0, y1 = self.clip(x, y, radius)
+        size = self.chunk_size
+        occupied = []
+        for cx, cy in itertools.product(range(x0 // size, x1 // size + 1), range(y0 // size, y1 // size + 1)):
+            cells = self.chunks.get((cx, cy))
+            if cells is None:
+                continue
+            for (nx, ny), cell in cells.items():
+                if (x0 <= nx <= x1 and y0 <= ny <= y1 and
+                        (moore or abs(nx - x) + abs(ny - y) <= radius) and
+                        (include_center or (nx, ny) != pos)):
+                    occupied.append(((nx, ny), cell))
+
+        occupied.sort(key=lambda item: item[0])
+        return itertools.chain.from_iterable(cell for _, cell in occupied)
+
+    def get_neighbors(self, pos, moore, include_center=False, radius=1):
+        return list(self.iter_neighbors(pos, moore, include_center, radius))
+
+    def occupied_cells(self):
+        for cells in self.chunks.values():
+            yield from cells.items()
@@ -0,0 +1,182 @@
+from model import AsteroidMiningColony
+from memory import deep_sizeof
+
+import bisect
+import functools
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# upper bounds of the step latency histogram, in seconds
+LATENCY_BUCKETS = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+
+def row_bytes(rows):
+    # bytes the last row adds on top of the one before it, which already holds the interned
+    # strings and small numbers every row shares
+    if not rows:
+        return 0
+    seen = set()
+    if len(rows) > 1:
+        deep_sizeof(rows[-2], seen)
+    return deep_sizeof(rows[-1], seen)
+
+def collector_bytes_estimate(collector):
+    # the size of the latest rows times their number, instead of walking the whole history
+    columns = list(collector.model_vars.values())
+    rows = min((len(column) for column in columns), default=0)
+    model_rows = [[column[i] for column in columns] for i in range(max(0, rows - 2), rows)]
+    agent_records = collector._agent_records
+    agent_rows = [agent_records[step] for step in list(agent_records)[-2:]]
+    return rows * row_bytes(model_rows) + len(agent_records) * row_bytes(agent_rows)
+
+class Telemetry:
+    # Prometheus text metrics for whichever colony is stepping in this process. enable() wraps
+    # AsteroidMiningColony.step to time each step, much like profiling.Profiler, so headless
+    # runs, web servers and models rebuilt by a reset are all covered. Step counts and the
+    # latency histogram are updated on every step; the gauges (agents, states, beacons, queues,
+    # collector size) are read from the model at most every `interval` seconds, on the stepping
+    # thread, and the HTTP thread only formats the last copy.
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.bucket_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_sum = 0.0
+        self.steps = 0
+        self.rates = deque(maxlen=16)  # (time, step_counter) samples for the steps/s gauge
+        self.gauges = {}
+        self.published = 0.0
+        self.original = None
+        self.httpd = None
+
+    def enable(self):
+        if self.original is None:
+            self.original = AsteroidMiningColony.__dict__["step"]
+            AsteroidMiningColony.step = self.wrap(self.original)
+        return self
+
+    def disable(self):
+        if self.original is not None:
+            AsteroidMiningColony.step = self.original
+            self.original = None
+
+    def wrap(self, step):
+        telemetry = self
+
+        @functools.wraps(step)
+        def timed(model, *args, **kwargs):
+            start, before = time.perf_counter(), model.step_counter
+            result = step(model, *args, **kwargs)
+            telemetry.observe(model, time.perf_counter() - start, model.step_counter - before)
+            return result
+        return timed
+
+    def observe(self, model, seconds, steps=1):
+        # a fast-forward jump covers several steps in one call, each at the call's mean latency
+        now = time.monotonic()
+        steps = max(1, steps)
+        with self.lock:
+            self.bucket_counts[bisect.bisect_left(LATENCY_BUCKETS, seconds / steps)] += steps
+            self.latency_sum += seconds
+            self.steps += steps
+        if now - self.published >= self.interval:
+            gauges = self.read(model)
+            with self.lock:
+                self.gauges = gauges
+                self.rates.append((now, model.step_counter))
+                self.published = now
+
+    def read(self, model):
+        agents = {}
+        for agent in model.schedule.agents:
+            agents[agent.type] = agents.get(agent.type, 0) + 1
+        return {
+            "step": model.step_counter,
+            "agents": agents,
+            "states": {kind: dict(counts) for kind, counts in model.state_counts.items()},
+            "beacons": len(model.active_beacons),
+            "radiations": len(model.active_radiations),
+            "queues": {station.unique_id: station.queue_length for station in model.stations},
+            "collector_rows": len(next(iter(model.datacollector.model_vars.values()), [])),
+            "collector_bytes": collector_bytes_estimate(model.datacollector),
+            "steps_stats": dict(model.schedule.steps_stats),
+        }
+
+    def render(self):
+        with self.lock:
+            bucket_counts = list(self.bucket_counts)
+            latency_sum, steps = self.latency_sum, self.steps
+            gauges, rates = self.gauges, list(self.rates)
+
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{value}"' for key, value in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        metric("colony_steps_total", "counter", "Colony steps executed in this process", [({}, steps)])
+        rate = 0.0
+        if len(rates) > 1 and rates[-1][0] > rates[0][0]:
+            rate = (rates[-1][1] - rates[0][1]) / (rates[-1][0] - rates[0][0])
+        metric("colony_steps_per_second", "gauge", "Recent simulation speed", [({}, rate)])
+
+        cumulative, samples = 0, []
+        for bound, count in zip(LATENCY_BUCKETS + ["+Inf"], bucket_counts):
+            cumulative += count
+            samples.append(({"le": bound}, cumulative))
+        metric("colony_step_latency_seconds", "histogram", "Wall time of one colony step", [])
+        lines += [f'colony_step_latency_seconds_bucket{{le="{labels["le"]}"}} {value}' for labels, value in samples]
+        lines.append(f"colony_step_latency_seconds_sum {latency_sum}")
+        lines.append(f"colony_step_latency_seconds_count {steps}")
+
+        if gauges:
+            metric("colony_step", "gauge", "Step counter of the current colony", [({}, gauges["step"])])
+            metric("colony_agents", "gauge", "Scheduled agents by type",
+                   [({"type": agent_type}, count) for agent_type, count in sorted(gauges["agents"].items())])
+            metric("colony_drones", "gauge", "Drones by type and state",
+                   [({"type": kind, "state": state}, count)
+                    for kind, counts in gauges["states"].items() for state, count in counts.items()])
+            metric("colony_active_beacons", "gauge", "Beacons currently placed", [({}, gauges["beacons"])])
+            metric("colony_active_radiations", "gauge", "Solar radiation events in progress",
+                   [({}, gauges["radiations"])])
+            metric("colony_station_queue_depth", "gauge", "Deliveries waiting at each station",
+                   [({"station": station}, depth) for station, depth in gauges["queues"].items()])
+            metric("colony_collector_rows", "gauge", "Rows held by the data collector",
+                   [({}, gauges["collector_rows"])])
+            metric("colony_collector_bytes", "gauge", "Estimated bytes held by the data collector",
+                   [({}, gauges["collector_bytes"])])
+            metric("colony_step_events", "gauge", "steps_stats counters of the last step",
+                   [({"event": name}, value) for name, value in sorted(gauges["steps_stats"].items())])
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port=9100, host="127.0.0.1"):
+        telemetry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = telemetry.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # scrapes would flood the runner's output
+
+        self.httpd = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+            self.httpd = None
+        self.disable()
@@ -0,0 +1,12 @@
+from bench import measure_startup
+
+# the default of bench.py --startup-budget
+STARTUP_BUDGET = 1.5
+
+def test_headless_startup_within_budget():
+    wall, elapsed, web = measure_startup()
+    assert elapsed <= STARTUP_BUDGET, f"importing and building a colony took {elapsed:.3f}s"
+
+def test_headless_path_skips_web_modules():
+    wall, elapsed, web = measure_startup(repeats=1)
+    assert web == [], f"headless path imported {', '.join(web)}"
@@ -0,0 +1,144 @@
+from agents import Asteroid
+
+import math
+import random
+
+RESOURCE_TYPES = ["iron", "gold", "platinum", "water", "helium"]
+RESOURCE_WEIGHTS = [0.5, 0.25, 0.1, 0.1, 0.05]
+BASE_VALUES = {"iron": 30, "gold": 25, "platinum": 20, "water": 25, "helium": 10}
+
+class ProceduralField:
+    # Asteroids generated on demand, one chunk_size x chunk_size chunk at a time. A chunk is
+    # generated from its own seed (world seed + chunk coordinates) the first time it comes
+    # within sensor range of a drone, so its contents never depend on the order chunks are
+    # visited in. Chunks more than evict_distance chunks away from every drone (and holding
+    # no active beacon) are dropped every evict_every steps; when a drone comes back they are
+    # regenerated identically, keep their unique_ids, and mined values are restored from a
+    # small delta record.
+    def __init__(self, model, seed, density, chunk_size=32, evict_distance=4, evict_every=10):
+        self.model = model
+        self.seed = seed
+        self.density = density  # expected asteroids per cell
+        self.chunk_size = chunk_size
+        self.evict_distance = evict_distance
+        self.evict_every = evict_every
+
+        self.loaded = {}  # chunk -> asteroids, in generation order
+        self.ids = {}  # chunk -> unique_ids handed out on first generation
+        self.deltas = {}  # evicted chunk -> {index: (resource_value, is_depleted)}
+        self.generated = 0
+        self.evicted = 0
+
+    def chunk_of(self, pos):
+        return pos[0] // self.chunk_size, pos[1] // self.chunk_size
+
+    def generate(self, key):
+        cx, cy = key
+        size = self.chunk_size
+        x0, y0 = cx * size, cy * size
+        x1, y1 = min(x0 + size, self.model.width), min(y0 + size, self.model.height)
+        rng = random.Random(f"{self.seed}:{cx}:{cy}")
+
+        def free_point(clearance):
+            # a few tries to land clear of every station, like create_asteroids
+            for _ in range(20):
+                x, y = rng.randrange(x0, x1), rng.randrange(y0, y1)
+                if all(abs(x - sx) > clearance or abs(y - sy) > clearance for sx, sy in self.model.station_positions):
+                    return x, y
+            return None
+
+        def value_of(resource_type):
+            return int(BASE_VALUES[resource_type] * rng.uniform(0.7, 1.3) * self.model.resource_richness)
+
+        expected = self.density * (x1 - x0) * (y1 - y0)
+        count = int(expected) + (rng.random() < expected - int(expected))
+        specs = []
+        while len(specs) < count:
+            if rng.random() < 0.8:
+                # most asteroids come in clusters around a primary resource
+                centre = free_point(5)
+                if centre is None:
+                    break
+                primary_resource = rng.choices(RESOURCE_TYPES, weights=RESOURCE_WEIGHTS, k=1)[0]
+                for _ in range(rng.randint(3, 10)):
+                    if len(specs) >= count:
+                        break
+                    radius = rng.randint(1, 5)
+                    angle = rng.uniform(0, 2 * math.pi)
+                    x = max(x0, min(int(centre[0] + radius * math.cos(angle)), x1 - 1))
+                    y = max(y0, min(int(centre[1] + radius * math.sin(angle)), y1 - 1))
+                    if rng.random() < 0.8:
+                        resource_type = primary_resource
+                    else:
+                        resource_type = rng.choices(RESOURCE_TYPES, weights=RESOURCE_WEIGHTS, k=1)[0]
+                    specs.append(((x, y), resource_type, value_of(resource_type)))
+            else:
+                pos = free_point(3)
+                if pos is None:
+                    break
+                resource_type = rng.choices(RESOURCE_TYPES, weights=RESOURCE_WEIGHTS, k=1)[0]
+                specs.append((pos, resource_type, value_of(resource_type)))
+        return specs
+
+    def load(self, key):
+        specs = self.generate(key)
+        if key not in self.ids:
+            self.ids[key] = [self.model.next_id() for _ in specs]
+        delta = self.deltas.pop(key, {})
+
+        asteroids = []
+        for i, (pos, resource_type, resource_value) in enumerate(specs):
+            asteroid = Asteroid(self.ids[key][i], self.model, resource_type, resource_value)
+            if i in delta:
+                asteroid.resource_value, asteroid.is_depleted = delta[i]
+            self.model.place_asteroid(asteroid, pos)
+            asteroids.append(asteroid)
+
+        self.loaded[key] = asteroids
+        self.generated += len(asteroids)
+
+    def evict(self, keys):
+        evicted = set()
+        for key in keys:
+            asteroids = self.loaded.pop(key)
+            delta = {i: (asteroid.resource_value, asteroid.is_depleted) for i, asteroid in enumerate(asteroids)
+                     if asteroid.resource_value != asteroid.original_value or asteroid.is_depleted}
+            if delta:
+                self.deltas[key] = delta
+            for asteroid in asteroids:
+                self.model.value_index.remove(asteroid)
+                self.model.grid.remove_agent(asteroid)
+                self.model.schedule.remove(asteroid)
+                evicted.add(asteroid.unique_id)
+                self.model.mark_changed(asteroid)
+
+        if evicted:
+            self.model.asteroids = [a for a in self.model.asteroids if a.unique_id not in evicted]
+            self.evicted += len(evicted)
+
+    def update(self):
+        model = self.model
+        reach = max(model.scout_sensor_range, 1) + 1
+        drones = model.scouts + model.miners
+
+        active = set()
+        for drone in drones:
+            x, y = drone.pos
+            cx0, cy0 = self.chunk_of((max(0, x - reach), max(0, y - reach)))
+            cx1, cy1 = self.chunk_of((min(model.width - 1, x + reach), min(model.height - 1, y + reach)))
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    active.add((cx, cy))
+
+        for key in sorted(active - self.loaded.keys()):
+            self.load(key)
+
+        if self.evict_distance is None or model.schedule.steps % self.evict_every:
+            return
+
+        pinned = {self.chunk_of(beacon.pos) for beacon in model.active_beacons}
+        drone_chunks = {self.chunk_of(drone.pos) for drone in drones}
+        far = [key for key in self.loaded
+               if key not in pinned and all(max(abs(key[0] - cx), abs(key[1] - cy)) > self.evict_distance
+                                            for cx, cy in drone_chunks)]
+        self.evict(far)